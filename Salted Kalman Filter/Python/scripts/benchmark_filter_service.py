@@ -0,0 +1,118 @@
+"""
+benchmark_filter_service.py
+
+This script is a local load generator for the shared-memory filter service in `filter_service.py`.
+It serves many Salted Kalman Filters (SKF) on the simple hybrid system from worker processes, submits
+noisy measurements for all of them, and reports:
+- Throughput: applied predict + update requests per second.
+- Read latency: time for a consistent (seqlock-validated) snapshot of one filter while the workers are busy.
+
+The simple hybrid system is written directly in NumPy so the filters can be built inside the workers.
+"""
+
+import sys
+import pathlib
+import time
+import numpy as np
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from src.skf import SKF
+from src.filter_service import FilterService
+
+
+""" Simple hybrid system kernels: mode I flows [1, -1], mode J flows [1, 1], guard x1 = 0. """
+def fI(states, inputs, dt, parameters):
+    return np.array([1.0, -1.0])
+
+def fJ(states, inputs, dt, parameters):
+    return np.array([1.0, 1.0])
+
+def A_disc(states, inputs, dt, parameters):
+    return np.eye(2)
+
+def y(states, parameters):
+    return np.array([states[0], states[1]])
+
+def C(states, parameters):
+    return np.eye(2)
+
+def rIJ(states, inputs, dt, parameters):
+    return np.array([states[0], states[1]])
+
+def RIJ(states, inputs, dt, parameters):
+    return np.eye(2)
+
+def gIJ(t, states, inputs, dt, parameters):
+    return -states[0]
+
+def GIJ(states, inputs, dt, parameters):
+    return np.array([[-1.0, 0.0]])
+
+def GtIJ(t, states, inputs, dt, parameters):
+    return np.zeros((1, 1))
+
+
+n_states = 2
+dt = 0.1
+modes = ["I", "J"]
+
+
+def filter_factory(filter_idx):
+    """
+    Builds the SKF served as filter filter_idx.
+    """
+    noise_matrices = {
+        "I": {"W": 0.01 * np.eye(n_states), "V": 0.025 * np.eye(n_states)},
+        "J": {"W": 0.01 * np.eye(n_states), "V": 0.025 * np.eye(n_states)},
+    }
+    return SKF(
+        init_state=np.array([-2.5, 0.0]),
+        init_mode="I",
+        init_cov=0.1 * np.eye(n_states),
+        dt=dt,
+        noise_matrices=noise_matrices,
+        dynamics={
+            "I": {"f_cont": fI, "A_disc": A_disc, "y": y, "C": C},
+            "J": {"f_cont": fJ, "A_disc": A_disc, "y": y, "C": C},
+        },
+        resets={"I": {"J": {"r": rIJ, "R": RIJ}}},
+        guards={"I": {"J": {"g": gIJ, "G": GIJ, "Gt": GtIJ}}},
+        parameters=np.array([]),
+    )
+
+
+if __name__ == "__main__":
+    n_filters = 64
+    n_workers = 4
+    n_timesteps = 50
+
+    service = FilterService(n_filters, n_states, modes, filter_factory, n_workers=n_workers)
+    rng = np.random.default_rng(0)
+    zero_input = np.array([0.0])
+    read_state = np.empty(n_states)
+    read_cov = np.empty((n_states, n_states))
+    read_latencies = []
+
+    start = time.perf_counter()
+    for time_idx in range(1, n_timesteps):
+        true_position = -2.5 + time_idx * dt
+        true_state = np.array([true_position, abs(true_position) - 2.5])
+        for filter_idx in range(n_filters):
+            measurement = true_state + rng.normal(0.0, np.sqrt(0.025), n_states)
+            service.submit(filter_idx, time_idx * dt, zero_input, measurement)
+            """ Read another filter while the workers are busy. """
+            read_start = time.perf_counter()
+            service.arena.read((filter_idx * 7) % n_filters, read_state, read_cov)
+            read_latencies.append(time.perf_counter() - read_start)
+    service.flush()
+    elapsed = time.perf_counter() - start
+
+    state, cov, mode = service.arena.read(0)
+    service.close()
+
+    read_latencies = np.array(read_latencies) * 1e6
+    print("filters: %d, workers: %d" % (n_filters, n_workers))
+    print("updates/s:          %10.1f" % (n_filters * (n_timesteps - 1) / elapsed))
+    print("read latency p50:   %10.2f us" % np.percentile(read_latencies, 50))
+    print("read latency p99:   %10.2f us" % np.percentile(read_latencies, 99))
+    print("filter 0 final state " + str(state) + " in mode " + mode)
@@ -0,0 +1,144 @@
+"""
+benchmark_numba_backend.py
+
+This script compares the throughput of the Salted Kalman Filter (SKF) on the 1D bouncing ball with
+the default `solve_ivp` integrator against the fast backends in `numba_backend.py`:
+- SKF with the fixed-step RK4 integrator (`fixed_step_solve`) and JIT-compiled model kernels (`jit_model`).
+- `CompiledSKF`, which runs the integrator with event location, the covariance propagation, the saltation
+  matrices and the measurement update as nopython functions generated over the compiled kernels.
+
+The bouncing ball is written directly in NumPy here, so the benchmark does not need SymPy; SymPy models
+generated with kernel_codegen.lambdify_kernels compile the same way. If Numba is not installed the fast
+backends run as plain NumPy code, and the speedup comes from the fixed-step integrator alone. Compilation
+happens in a warm-up run that is timed separately; it is cached to disk, so later runs mostly load it.
+"""
+
+import sys
+import pathlib
+import time
+import functools
+import numpy as np
+from scipy.integrate import solve_ivp
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from src.skf import SKF
+from src.hybrid_simulator import HybridSimulator
+from src.numba_backend import NUMBA_AVAILABLE, jit_model, fixed_step_solve, CompiledSKF
+
+
+""" Bouncing ball kernels. parameters = [coefficient of restitution, gravity]. """
+def f_cont(states, inputs, dt, parameters):
+    return np.array([states[1], -parameters[1]])
+
+def A_disc(states, inputs, dt, parameters):
+    return np.array([[1.0, dt], [0.0, 1.0]])
+
+def y(states, parameters):
+    return np.array([states[0], states[1]])
+
+def C(states, parameters):
+    return np.eye(2)
+
+def r_impact(states, inputs, dt, parameters):
+    return np.array([states[0], -parameters[0] * states[1]])
+
+def R_impact(states, inputs, dt, parameters):
+    return np.array([[1.0, 0.0], [0.0, -parameters[0]]])
+
+def r_apex(states, inputs, dt, parameters):
+    return np.array([states[0], states[1]])
+
+def R_apex(states, inputs, dt, parameters):
+    return np.eye(2)
+
+def g_impact(t, states, inputs, dt, parameters):
+    return states[0]
+
+def G_impact(states, inputs, dt, parameters):
+    return np.array([[1.0, 0.0]])
+
+def g_apex(t, states, inputs, dt, parameters):
+    return states[1]
+
+def G_apex(states, inputs, dt, parameters):
+    return np.array([[0.0, 1.0]])
+
+def Gt(t, states, inputs, dt, parameters):
+    return np.zeros((1, 1))
+
+
+dynamics = {
+    "I": {"f_cont": f_cont, "A_disc": A_disc, "y": y, "C": C},
+    "J": {"f_cont": f_cont, "A_disc": A_disc, "y": y, "C": C},
+}
+resets = {"I": {"J": {"r": r_impact, "R": R_impact}}, "J": {"I": {"r": r_apex, "R": R_apex}}}
+guards = {"I": {"J": {"g": g_impact, "G": G_impact, "Gt": Gt}}, "J": {"I": {"g": g_apex, "G": G_apex, "Gt": Gt}}}
+
+n_states = 2
+noise_matrices = {
+    "I": {"W": 0.01 * np.eye(n_states), "V": 0.025 * np.eye(n_states)},
+    "J": {"W": 0.01 * np.eye(n_states), "V": 0.025 * np.eye(n_states)},
+}
+parameters = np.array([0.9, 9.8])
+dt = 0.01
+n_timesteps = 500
+
+
+def run_filter(filter_class, dynamics, resets, guards, measurements, **kwargs):
+    """
+    Runs the filter over the measurements and returns the final state and the elapsed time.
+    """
+    skf = filter_class(
+        init_state=np.array([5.0, 0.0]),
+        init_mode="I",
+        init_cov=0.1 * np.eye(n_states),
+        dt=dt,
+        noise_matrices=noise_matrices,
+        dynamics=dynamics,
+        resets=resets,
+        guards=guards,
+        parameters=parameters,
+        **kwargs,
+    )
+    zero_input = np.array([0.0])
+    start = time.perf_counter()
+    for time_idx in range(1, n_timesteps):
+        state, cov = skf.step(time_idx * dt, zero_input, measurements[time_idx - 1])
+    return state.copy(), time.perf_counter() - start
+
+
+""" Simulate noisy measurements of the bouncing ball. """
+hybrid_simulator = HybridSimulator(
+    init_state=np.array([5.0, 0.0]),
+    init_mode="I",
+    dt=dt,
+    noise_matrices=noise_matrices,
+    dynamics=dynamics,
+    resets=resets,
+    guards=guards,
+    parameters=parameters,
+)
+measurements = np.zeros((n_timesteps - 1, n_states))
+for time_idx in range(1, n_timesteps):
+    hybrid_simulator.simulate_timestep(time_idx * dt, np.array([0.0]))
+    measurements[time_idx - 1] = hybrid_simulator.get_measurement(measurement_noise_flag=True)
+
+fast_dynamics, fast_resets, fast_guards = jit_model(dynamics, resets, guards)
+fast_integrator = functools.partial(fixed_step_solve, n_substeps=4)
+
+""" Warm up once so JIT compilation is not timed. """
+_, fast_compile_time = run_filter(SKF, fast_dynamics, fast_resets, fast_guards, measurements, integrator=fast_integrator)
+_, compiled_compile_time = run_filter(CompiledSKF, dynamics, resets, guards, measurements, n_substeps=4)
+
+default_state, default_time = run_filter(SKF, dynamics, resets, guards, measurements)
+fast_state, fast_time = run_filter(SKF, fast_dynamics, fast_resets, fast_guards, measurements, integrator=fast_integrator)
+compiled_state, compiled_time = run_filter(CompiledSKF, dynamics, resets, guards, measurements, n_substeps=4)
+
+n_steps = n_timesteps - 1
+print("Numba available: " + str(NUMBA_AVAILABLE))
+print("warm-up (incl. compilation): fixed-step %.1f s, CompiledSKF %.1f s" % (fast_compile_time, compiled_compile_time))
+print("solve_ivp backend:          %9.1f steps/s" % (n_steps / default_time))
+print("fixed-step + jit_model:     %9.1f steps/s (%.1fx)" % (n_steps / fast_time, default_time / fast_time))
+print("CompiledSKF:                %9.1f steps/s (%.1fx)" % (n_steps / compiled_time, default_time / compiled_time))
+print("final state difference (fixed-step): " + str(np.abs(default_state - fast_state).max()))
+print("final state difference (CompiledSKF): " + str(np.abs(default_state - compiled_state).max()))
@@ -3,7 +3,10 @@ bouncing_ball_hybrid_system.py
 
 This script simulates a 1D bouncing ball system using a Salted Kalman Filter (SKF) for hybrid state estimation.
 The ball has two modes: 'I' (falling) and 'J' (rising). Impacts with the ground (guard at y=0) are modeled with
-a coefficient of restitution. The SKF tracks the ball's position and velocity despite noisy measurements.
+a coefficient of restitution. Once the impacts start chattering (Zeno behavior), the ball is switched into the
+sticking mode 'K' where it rests on the ground. Set moving_guard = True to bounce the ball on a paddle moving as
+0.25*sin(4*pi*t) instead; the guard and the impact reset then depend on time, and the paddle trajectory is
+sampled and interpolated with interpolate_surface as if it had been logged. The SKF tracks the ball's position and velocity despite noisy measurements.
 
 Key Components:
 - Defines symbolic continuous and discrete dynamics, measurements, resets, and guards for the hybrid system.
@@ -29,12 +32,15 @@ import matplotlib.pyplot as plt
 sys.path.append(str(pathlib.Path(__file__).parent.parent))
 from src.skf import SKF
 from src.hybrid_simulator import HybridSimulator
+from src.hybrid_helper_functions import interpolate_surface
+from src.kernel_codegen import lambdify_kernels
 
 
-def symbolic_dynamics():
+def symbolic_dynamics(moving_guard=False):
     """
     Returns (Tuple[Dict, Dict]): dynamic functions in a nested dict and reset functions in a nested dict.
     Modes are {'up','down'}. e is coefficient of resititution.
+    If moving_guard is True, the ground is replaced by a paddle moving as 0.25*sin(4*pi*t).
     """
     q, q_dot, e, g, u, dt, t = sp.symbols("q q_dot e g u dt t")
 
@@ -47,33 +53,76 @@ def symbolic_dynamics():
     """ Defining the dynamics of the system. """
     fI = Matrix([q_dot, -g])
     fJ = Matrix([q_dot, -g])
+    fK = Matrix([q_dot, 0])
     
     """ Define the measurements of the system. """
     yI = Matrix([q, q_dot])
     yJ = Matrix([q, q_dot])
+    yK = Matrix([q, q_dot])
 
     """ Discretize the dynamics using euler integration. """
     fI_disc = states + fI * dt
     fJ_disc = states + fJ * dt
+    fK_disc = states + fK * dt
 
     """ Take the jacobian with respect to states and inputs. """
     AI_disc = fI_disc.jacobian(states)
     AJ_disc = fJ_disc.jacobian(states)
+    AK_disc = fK_disc.jacobian(states)
 
     """ Take the jacobian of the measurements with respect to the states. """
     CI = yI.jacobian(states)
     CJ = yJ.jacobian(states)
-
-    """ Define resets. """
-    rIJ = Matrix([q, -e*q_dot])
+    CK = yK.jacobian(states)
+
+    """ Define the position of the guard. """
+    surface_modules = {}
+    if moving_guard:
+        """ Paddle moving up and down, sampled as if logged and interpolated with interpolate_surface.
+        Its derivatives are separate functions, so Gt and Rt use the velocity and acceleration interpolants. """
+        paddle_times = np.linspace(0.0, 10.0, 2001)
+        surface_position, surface_velocity, surface_acceleration = interpolate_surface(
+            paddle_times, 0.25*np.sin(4*np.pi*paddle_times)
+        )
+        surface_modules = {
+            "paddle_position": surface_position,
+            "paddle_velocity": surface_velocity,
+            "paddle_acceleration": surface_acceleration,
+        }
+
+        """ Symbolic stand-ins for the interpolants, named like the keys above for lambdify. """
+        class paddle_acceleration(sp.Function):
+            pass
+
+        class paddle_velocity(sp.Function):
+            def fdiff(self, argindex=1):
+                return paddle_acceleration(self.args[0])
+
+        class paddle_position(sp.Function):
+            def fdiff(self, argindex=1):
+                return paddle_velocity(self.args[0])
+
+        x_p = paddle_position(t)
+    else:
+        x_p = 0 # guard is located at y = 0
+    x_p_dot = sp.diff(x_p, t)
+
+    """ Define resets. The ball bounces off the guard relative to its velocity. """
+    rIJ = Matrix([q, -e*q_dot + (1 + e)*x_p_dot])
     rJI = Matrix([q, q_dot])
+    rIK = Matrix([q, 0])
 
     """ Take the jacobian of resets with resepct to states. """
     RIJ = rIJ.jacobian(states)
     RJI = rJI.jacobian(states)
+    RIK = rIK.jacobian(states)
+
+    """ Take the jacobian of resets with respect to time. """
+    RtIJ = rIJ.jacobian(time)
+    RtJI = rJI.jacobian(time)
+    RtIK = rIK.jacobian(time)
 
     """ Define guards. """
-    x_p = 0 # guard is located at y = 0
     gIJ = Matrix([q - x_p])
     gJI = Matrix([q_dot])
 
@@ -89,43 +138,70 @@ def symbolic_dynamics():
     """ Define the parameters of the system. """
     parameters = Matrix([e, g])  # parameters = [coefficient of restitution, gravity]
 
-    rIJ_func = sp.lambdify((states, inputs, dt, parameters), rIJ)
-    RIJ_func = sp.lambdify((states, inputs, dt, parameters), RIJ)
-
-    rJI_func = sp.lambdify((states, inputs, dt, parameters), rJI)
-    RJI_func = sp.lambdify((states, inputs, dt, parameters), RJI)
-
-    gIJ_func = sp.lambdify((t, states, inputs, dt, parameters), gIJ)
-    GIJ_func = sp.lambdify((states, inputs, dt, parameters), GIJ)
-    GtIJ_func = sp.lambdify((t, states, inputs, dt, parameters), GtIJ)
-
-    gJI_func = sp.lambdify((t, states, inputs, dt, parameters), gJI)
-    GJI_func = sp.lambdify((states, inputs, dt, parameters), GJI)
-    GtJI_func = sp.lambdify((t, states, inputs, dt, parameters), GtJI)
-
-    fI_func = sp.lambdify((states, inputs, dt, parameters), fI)
-    AI_disc_func = sp.lambdify((states, inputs, dt, parameters), AI_disc)
-
-    fJ_func = sp.lambdify((states, inputs, dt, parameters), fJ)
-    AJ_disc_func = sp.lambdify((states, inputs, dt, parameters), AJ_disc)
-
-    yI_func = sp.lambdify((states, parameters), yI)
-    CI_func = sp.lambdify((states, parameters), CI)
-
-    yJ_func = sp.lambdify((states, parameters), yJ)
-    CJ_func = sp.lambdify((states, parameters), CJ)
+    """ Generate the kernels as float-typed NumPy functions in a module on disk (see kernel_codegen.py), so they
+    also compile with Numba. Resets and guards are time-varying, so all of their functions take the time first. """
+    kernel_args = (states, inputs, dt, parameters)
+    measurement_args = (states, parameters)
+    timed_args = (t, states, inputs, dt, parameters)
+    kernels = lambdify_kernels(
+        {
+            "rIJ": (timed_args, rIJ),
+            "RIJ": (timed_args, RIJ),
+            "RtIJ": (timed_args, RtIJ),
+            "rJI": (timed_args, rJI),
+            "RJI": (timed_args, RJI),
+            "RtJI": (timed_args, RtJI),
+            "rIK": (timed_args, rIK),
+            "RIK": (timed_args, RIK),
+            "RtIK": (timed_args, RtIK),
+            "gIJ": (timed_args, gIJ),
+            "GIJ": (timed_args, GIJ),
+            "GtIJ": (timed_args, GtIJ),
+            "gJI": (timed_args, gJI),
+            "GJI": (timed_args, GJI),
+            "GtJI": (timed_args, GtJI),
+            "fI": (kernel_args, fI),
+            "AI_disc": (kernel_args, AI_disc),
+            "fJ": (kernel_args, fJ),
+            "AJ_disc": (kernel_args, AJ_disc),
+            "fK": (kernel_args, fK),
+            "AK_disc": (kernel_args, AK_disc),
+            "yI": (measurement_args, yI),
+            "CI": (measurement_args, CI),
+            "yJ": (measurement_args, yJ),
+            "CJ": (measurement_args, CJ),
+            "yK": (measurement_args, yK),
+            "CK": (measurement_args, CK),
+        },
+        modules=surface_modules,
+    )
 
     dynamics = {
-        "I": {"f_cont": fI_func, "A_disc": AI_disc_func, "y": yI_func, "C": CI_func},
-        "J": {"f_cont": fJ_func, "A_disc": AJ_disc_func, "y": yJ_func, "C": CJ_func},
+        "I": {"f_cont": kernels["fI"], "A_disc": kernels["AI_disc"], "y": kernels["yI"], "C": kernels["CI"]},
+        "J": {"f_cont": kernels["fJ"], "A_disc": kernels["AJ_disc"], "y": kernels["yJ"], "C": kernels["CJ"]},
+        "K": {"f_cont": kernels["fK"], "A_disc": kernels["AK_disc"], "y": kernels["yK"], "C": kernels["CK"]},
     }
-    resets = {"I": {"J": {"r": rIJ_func, "R": RIJ_func}}, "J": {"I": {"r": rJI_func, "R": RJI_func}}}
-    guards = {"I": {"J": {"g": gIJ_func, "G": GIJ_func, "Gt": GtIJ_func}}, "J": {"I": {"g": gJI_func, "G": GJI_func, "Gt": GtJI_func}}}
+    resets = {
+        "I": {
+            "J": {"r": kernels["rIJ"], "R": kernels["RIJ"], "Rt": kernels["RtIJ"], "time_varying": True},
+            "K": {"r": kernels["rIK"], "R": kernels["RIK"], "Rt": kernels["RtIK"], "time_varying": True},
+        },
+        "J": {"I": {"r": kernels["rJI"], "R": kernels["RJI"], "Rt": kernels["RtJI"], "time_varying": True}},
+    }
+    guards = {
+        "I": {"J": {"g": kernels["gIJ"], "G": kernels["GIJ"], "Gt": kernels["GtIJ"], "time_varying": True}},
+        "J": {"I": {"g": kernels["gJI"], "G": kernels["GJI"], "Gt": kernels["GtJI"], "time_varying": True}},
+    }
+    if moving_guard:
+        """ The moving paddle can also catch up with the rising ball, so it is a guard of mode J as well. """
+        resets["J"]["J"] = resets["I"]["J"]
+        guards["J"]["J"] = guards["I"]["J"]
     return dynamics, resets, guards
 
 
 """ Define dynamics and resets. """
-dynamics, resets, guards = symbolic_dynamics()
+moving_guard = False # set to True for a paddle moving as 0.25*sin(4*pi*t)
+dynamics, resets, guards = symbolic_dynamics(moving_guard)
 
 """ Define noise matrices. """
 n_states = 2
@@ -134,12 +210,13 @@ V_global = 0.025 * np.eye(n_states)
 noise_matrices = {
     "I": {"W": W_global, "V": V_global},
     "J": {"W": W_global, "V": V_global},
+    "K": {"W": 0.01 * W_global, "V": V_global},
 }
 
 """ Initialize states and covariance. """
 mean_init_state = np.array([5, 0])
 mean_init_cov = 0.1*np.eye(n_states)
-init_mode = "I"  # Modes are {I, J}
+init_mode = "I"  # Modes are {I, J, K}
 
 """ Define timesteps. """
 dt = 0.05
@@ -147,6 +224,12 @@ dt = 0.05
 """ Define parameters. """
 parameters = np.array([0.7, 9.8]) # [coeff of rest., gravity, mass]
 
+""" Define Zeno detection: switch to sticking once bounces are closer than min_event_interval.
+The sticking mode rests on flat ground, so it is only used without the moving paddle. """
+zeno_modes = {} if moving_guard else {"I": "K"}
+max_events_per_step = 4
+min_event_interval = 0.05
+
 """ Initialize filter. """
 skf = SKF(
     init_state=mean_init_state,
@@ -157,7 +240,10 @@ skf = SKF(
     dynamics=dynamics,
     resets=resets,
     guards=guards,
-    parameters=parameters
+    parameters=parameters,
+    zeno_modes=zeno_modes,
+    max_events_per_step=max_events_per_step,
+    min_event_interval=min_event_interval,
 )
 
 """ Initialize simulator. """
@@ -170,28 +256,32 @@ hybrid_simulator = HybridSimulator(
     dynamics=dynamics,
     resets=resets,
     guards=guards,
-    parameters=parameters
+    parameters=parameters,
+    zeno_modes=zeno_modes,
+    max_events_per_step=max_events_per_step,
+    min_event_interval=min_event_interval,
 )
 
 """ Run SKF simulation """
-n_simulate_timesteps = 100
+n_simulate_timesteps = 150
 timesteps = np.arange(0.0,n_simulate_timesteps*dt,dt)
 measurements = np.zeros((n_simulate_timesteps-1,n_states))
 actual_states = np.zeros((n_simulate_timesteps,n_states))
 filtered_states = np.zeros((n_simulate_timesteps,n_states))
-# guard = 0.25*np.sin(4*np.pi*timesteps*dt) #uncomment for moving guard
-guard = 0.0*timesteps
+if moving_guard:
+    guard = 0.25*np.sin(4*np.pi*timesteps)
+else:
+    guard = 0.0*timesteps
 
 actual_states[0,:] = hybrid_simulator.get_state()
 filtered_states[0,:] = mean_init_state
 
 zero_input = np.array([0.0])
 for time_idx in range(1,n_simulate_timesteps):
-    hybrid_simulator.simulate_timestep(0,np.array([0]))
+    hybrid_simulator.simulate_timestep(timesteps[time_idx-1],zero_input)
     actual_states[time_idx,:] = hybrid_simulator.get_state()
     measurements[time_idx-1,:] = hybrid_simulator.get_measurement(measurement_noise_flag=True)
-    skf.predict(timesteps[time_idx],zero_input)
-    filtered_states[time_idx,:], current_cov = skf.update(timesteps[time_idx],zero_input,measurements[time_idx-1,:])
+    skf.step(timesteps[time_idx-1],zero_input,measurements[time_idx-1,:],out_state=filtered_states[time_idx,:])
 
 
 """ Visualize results """
@@ -33,6 +33,7 @@ import matplotlib.pyplot as plt
 sys.path.append(str(pathlib.Path(__file__).parent.parent))
 from src.skf import SKF
 from src.hybrid_simulator import HybridSimulator
+from src.kernel_codegen import lambdify_kernels
 
 def symbolic_dynamics():
     """
@@ -81,31 +82,35 @@ def symbolic_dynamics():
     """ Define the parameters of the system. """
     parameters = Matrix([])
 
-    rIJ_func = sp.lambdify((states, inputs, dt, parameters), rIJ)
-    RIJ_func = sp.lambdify((states, inputs, dt, parameters), RIJ)
-
-    gIJ_func = sp.lambdify((t, states, inputs, dt, parameters), gIJ)
-    GIJ_func = sp.lambdify((states, inputs, dt, parameters), GIJ)
-    GtIJ_func = sp.lambdify((t, states, inputs, dt, parameters), GtIJ)
-
-    fI_func = sp.lambdify((states, inputs, dt, parameters), fI)
-    AI_disc_func = sp.lambdify((states, inputs, dt, parameters), AI_disc)
-
-    fJ_func = sp.lambdify((states, inputs, dt, parameters), fJ)
-    AJ_disc_func = sp.lambdify((states, inputs, dt, parameters), AJ_disc)
-
-    yI_func = sp.lambdify((states, parameters), yI)
-    CI_func = sp.lambdify((states, parameters), CI)
-
-    yJ_func = sp.lambdify((states, parameters), yJ)
-    CJ_func = sp.lambdify((states, parameters), CJ)
+    """ Generate the kernels as float-typed NumPy functions in a module on disk (see kernel_codegen.py), so they
+    also compile with Numba. """
+    kernel_args = (states, inputs, dt, parameters)
+    measurement_args = (states, parameters)
+    timed_args = (t, states, inputs, dt, parameters)
+    kernels = lambdify_kernels(
+        {
+            "rIJ": (kernel_args, rIJ),
+            "RIJ": (kernel_args, RIJ),
+            "gIJ": (timed_args, gIJ),
+            "GIJ": (kernel_args, GIJ),
+            "GtIJ": (timed_args, GtIJ),
+            "fI": (kernel_args, fI),
+            "AI_disc": (kernel_args, AI_disc),
+            "fJ": (kernel_args, fJ),
+            "AJ_disc": (kernel_args, AJ_disc),
+            "yI": (measurement_args, yI),
+            "CI": (measurement_args, CI),
+            "yJ": (measurement_args, yJ),
+            "CJ": (measurement_args, CJ),
+        }
+    )
 
     dynamics = {
-        "I": {"f_cont": fI_func, "A_disc": AI_disc_func, "y": yI_func, "C": CI_func},
-        "J": {"f_cont": fJ_func, "A_disc": AJ_disc_func, "y": yJ_func, "C": CJ_func},
+        "I": {"f_cont": kernels["fI"], "A_disc": kernels["AI_disc"], "y": kernels["yI"], "C": kernels["CI"]},
+        "J": {"f_cont": kernels["fJ"], "A_disc": kernels["AJ_disc"], "y": kernels["yJ"], "C": kernels["CJ"]},
     }
-    resets = {"I": {"J": {"r": rIJ_func, "R": RIJ_func}}}
-    guards = {"I": {"J": {"g": gIJ_func, "G": GIJ_func, "Gt": GtIJ_func}}}
+    resets = {"I": {"J": {"r": kernels["rIJ"], "R": kernels["RIJ"]}}}
+    guards = {"I": {"J": {"g": kernels["gIJ"], "G": kernels["GIJ"], "Gt": kernels["GtIJ"]}}}
     return dynamics, resets, guards
 
 
@@ -174,8 +179,7 @@ for time_idx in range(1,n_simulate_timesteps):
     hybrid_simulator.simulate_timestep(0,np.array([0]))
     actual_states[time_idx,:] = hybrid_simulator.get_state()
     measurements[time_idx-1,:] = hybrid_simulator.get_measurement(measurement_noise_flag=True)
-    skf.predict(timesteps[time_idx],zero_input)
-    filtered_states[time_idx,:], current_cov = skf.update(timesteps[time_idx],zero_input,measurements[time_idx-1,:])
+    skf.step(timesteps[time_idx],zero_input,measurements[time_idx-1,:],out_state=filtered_states[time_idx,:])
 
 """ Visualize results """
 
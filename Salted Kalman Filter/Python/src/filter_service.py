@@ -0,0 +1,284 @@
+"""
+filter_service.py
+
+This module runs many Salted Kalman Filters (SKF) in worker processes and publishes their estimates
+through shared memory, so consumer processes can read states, covariances and modes without pickling
+the filters on every update.
+
+Key Features:
+- One `multiprocessing.shared_memory` arena holding the state, covariance, mode code and sequence
+  counter of every filter.
+- Seqlock-consistent reads: writers make the sequence counter odd while writing, readers retry until they
+  see the same even counter before and after copying, and time out if a write never finishes.
+- Worker processes own disjoint subsets of the filters (filter_idx % n_workers) and apply predict/update
+  requests sent through per-worker queues.
+- Failed requests (or filters whose factory raised) never stall the service: the worker rolls the filter back,
+  counts the failure in the arena, sends the error message back, and flush raises a RuntimeError describing it.
+
+Main Classes:
+- SharedFilterArena:
+    - write: Publishes the state, covariance and mode of one filter.
+    - read: Copies a consistent snapshot of one filter, optionally into caller-provided buffers.
+    - begin_read / end_read: Zero-copy access to a filter's arrays, validated after use.
+    - failures: Number of requests of one filter that raised in its worker.
+- FilterService:
+    - submit: Queues a predict + update of one filter with a new measurement.
+    - flush: Waits until every queued request has been applied and raises if any of them failed.
+    - close: Stops the workers and releases the shared memory.
+
+See scripts/benchmark_filter_service.py for a load generator.
+"""
+
+import multiprocessing as mp
+import time
+import traceback
+from multiprocessing import shared_memory
+import numpy as np
+
+
+class SharedFilterArena:
+    def __init__(self, n_filters, n_states, modes, name=None):
+        """
+        n_filters (int): Number of filters stored in the arena.
+        n_states (int): Number of states of each filter.
+        modes (list): All modes of the system; modes are stored as their index in this list.
+        name (str): Name of an existing arena to attach to. A new arena is created if None.
+        """
+        self._n_filters = n_filters
+        self._n_states = n_states
+        self._modes = list(modes)
+        self._mode_codes = {mode: code for code, mode in enumerate(self._modes)}
+
+        seq_bytes = 8 * n_filters
+        failure_bytes = 8 * n_filters
+        mode_bytes = 8 * n_filters
+        state_bytes = 8 * n_filters * n_states
+        cov_bytes = 8 * n_filters * n_states * n_states
+        if name is None:
+            self._shm = shared_memory.SharedMemory(
+                create=True, size=seq_bytes + failure_bytes + mode_bytes + state_bytes + cov_bytes
+            )
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+
+        buffer = self._shm.buf
+        self._seq = np.ndarray((n_filters,), dtype=np.int64, buffer=buffer, offset=0)
+        self._failures = np.ndarray((n_filters,), dtype=np.int64, buffer=buffer, offset=seq_bytes)
+        offset = seq_bytes + failure_bytes
+        self._mode = np.ndarray((n_filters,), dtype=np.int64, buffer=buffer, offset=offset)
+        self._states = np.ndarray(
+            (n_filters, n_states), dtype=np.float64, buffer=buffer, offset=offset + mode_bytes
+        )
+        self._covs = np.ndarray(
+            (n_filters, n_states, n_states),
+            dtype=np.float64,
+            buffer=buffer,
+            offset=offset + mode_bytes + state_bytes,
+        )
+        if name is None:
+            self._seq[:] = 0
+            self._failures[:] = 0
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def write(self, filter_idx, state, cov, mode):
+        """
+        Publishes a new estimate of one filter. Only the owning worker may write a filter.
+        """
+        self._seq[filter_idx] += 1
+        self._states[filter_idx] = state
+        self._covs[filter_idx] = cov
+        self._mode[filter_idx] = self._mode_codes[mode]
+        self._seq[filter_idx] += 1
+
+    def record_failure(self, filter_idx):
+        """
+        Counts a failed request of one filter. Only the owning worker may record failures of a filter.
+        """
+        self._failures[filter_idx] += 1
+
+    def failures(self, filter_idx=None):
+        """
+        Returns the number of failed requests of one filter, or a copy of the counts of all filters.
+        """
+        if filter_idx is None:
+            return self._failures.copy()
+        return self._failures[filter_idx]
+
+    def begin_read(self, filter_idx, timeout=1.0):
+        """
+        Waits until no write is in progress and returns the sequence counter to validate against,
+        together with zero-copy views of the state and covariance.
+        Raises a TimeoutError if a write stays in progress for timeout seconds (e.g. its worker died).
+        """
+        deadline = None
+        while True:
+            seq = self._seq[filter_idx]
+            if seq % 2 == 0:
+                return seq, self._states[filter_idx], self._covs[filter_idx]
+            if deadline is None:
+                deadline = time.monotonic() + timeout
+            elif time.monotonic() > deadline:
+                raise TimeoutError(
+                    "Filter %d has been written for more than %g s; its worker may have died." % (filter_idx, timeout)
+                )
+
+    def end_read(self, filter_idx, seq):
+        """
+        Returns True if the filter was not written since begin_read returned seq.
+        """
+        return self._seq[filter_idx] == seq
+
+    def read(self, filter_idx, out_state=None, out_cov=None, timeout=1.0):
+        """
+        Returns a consistent copy of the state, covariance and mode of one filter.
+        out_state/out_cov are optional preallocated buffers to copy into.
+        timeout is passed to begin_read.
+        """
+        if out_state is None:
+            out_state = np.empty(self._n_states)
+        if out_cov is None:
+            out_cov = np.empty((self._n_states, self._n_states))
+        while True:
+            seq, state, cov = self.begin_read(filter_idx, timeout)
+            out_state[:] = state
+            out_cov[:] = cov
+            mode_code = self._mode[filter_idx]
+            if self.end_read(filter_idx, seq):
+                return out_state, out_cov, self._modes[mode_code]
+
+    def close(self):
+        """
+        Detaches from the shared memory.
+        """
+        del self._seq, self._failures, self._mode, self._states, self._covs
+        self._shm.close()
+
+    def unlink(self):
+        """
+        Frees the shared memory. Call once, from the process that created the arena.
+        """
+        self._shm.unlink()
+
+
+def _filter_worker(worker_idx, n_workers, arena_args, filter_factory, requests, errors):
+    """
+    Owns every filter with filter_idx % n_workers == worker_idx and applies the queued requests.
+    A request that raises is counted in the arena and its error is sent back through errors,
+    so every request is still marked done and flush() cannot block. The filter is rolled back to
+    its estimate before the request, so it stays in sync with the arena.
+    """
+    """ The first queued item only marks initialization, so flush() can wait for it. """
+    requests.get()
+    arena = SharedFilterArena(*arena_args)
+    """ Errors are only waited for by flush(), so unsent ones must not block the worker from exiting. """
+    errors.cancel_join_thread()
+
+    def report_failure(filter_idx):
+        errors.put((filter_idx, traceback.format_exc(limit=-1).strip()))
+        arena.record_failure(filter_idx)
+
+    filters = {}
+    for filter_idx in range(worker_idx, arena_args[0], n_workers):
+        try:
+            skf = filter_factory(filter_idx)
+            arena.write(filter_idx, skf.get_state(), skf.get_cov(), skf.get_mode())
+            filters[filter_idx] = skf
+        except Exception:
+            report_failure(filter_idx)
+    requests.task_done()
+
+    while True:
+        request = requests.get()
+        if request is None:
+            requests.task_done()
+            break
+        filter_idx, current_time, inputs, measurement = request
+        try:
+            if filter_idx not in filters:
+                raise RuntimeError("Filter %d was not created." % filter_idx)
+            skf = filters[filter_idx]
+            """ step may raise after predict already advanced the filter, so keep what the arena shows. """
+            saved_estimate = (skf.get_state(), skf.get_cov(), skf.get_mode())
+            try:
+                state, cov = skf.step(current_time, inputs, measurement)
+            except Exception:
+                skf.set_estimate(*saved_estimate)
+                raise
+            arena.write(filter_idx, state, cov, skf.get_mode())
+        except Exception:
+            report_failure(filter_idx)
+        requests.task_done()
+    arena.close()
+
+
+class FilterService:
+    def __init__(self, n_filters, n_states, modes, filter_factory, n_workers=2):
+        """
+        n_filters (int): Number of filters served.
+        n_states (int): Number of states of each filter.
+        modes (list): All modes of the system.
+        filter_factory (callable): filter_factory(filter_idx) returns the SKF for that filter. It runs in the
+            worker processes, so it must be picklable (a module-level function).
+        n_workers (int): Number of worker processes.
+        """
+        self.arena = SharedFilterArena(n_filters, n_states, modes)
+        self._n_workers = n_workers
+        arena_args = (n_filters, n_states, modes, self.arena.name)
+        self._queues = [mp.JoinableQueue() for _ in range(n_workers)]
+        self._errors = mp.Queue()
+        self._reported_failures = np.zeros(n_filters, dtype=np.int64)
+        self._workers = []
+        for worker_idx in range(n_workers):
+            self._queues[worker_idx].put("init")
+            worker = mp.Process(
+                target=_filter_worker,
+                args=(worker_idx, n_workers, arena_args, filter_factory, self._queues[worker_idx], self._errors),
+                daemon=True,
+            )
+            worker.start()
+            self._workers.append(worker)
+        """ Wait until every worker has built and published its filters. """
+        try:
+            self.flush()
+        except RuntimeError:
+            self.close()
+            raise
+
+    def submit(self, filter_idx, current_time, inputs, measurement):
+        """
+        Queues a predict and update of one filter with a new measurement.
+        """
+        self._queues[filter_idx % self._n_workers].put((filter_idx, current_time, inputs, measurement))
+
+    def flush(self):
+        """
+        Waits until every submitted request has been applied.
+        Raises a RuntimeError with the worker errors if any request failed since the last flush.
+        """
+        for requests in self._queues:
+            requests.join()
+        failures = self.arena.failures()
+        n_new_failures = int(np.sum(failures - self._reported_failures))
+        self._reported_failures = failures
+        if n_new_failures > 0:
+            messages = []
+            for _ in range(n_new_failures):
+                filter_idx, message = self._errors.get()
+                messages.append("filter %d: %s" % (filter_idx, message))
+            raise RuntimeError(
+                "%d filter request(s) failed:\n" % n_new_failures + "\n".join(messages)
+            )
+
+    def close(self):
+        """
+        Stops the workers and frees the shared memory.
+        """
+        for requests in self._queues:
+            requests.put(None)
+        for worker in self._workers:
+            worker.join()
+        self.arena.close()
+        self.arena.unlink()
@@ -0,0 +1,279 @@
+"""
+history_store.py
+
+This module stores long state/covariance/mode histories of the SKF and HybridSimulator compactly.
+Covariances are symmetric, so only their packed upper triangle (n(n+1)/2 of the n^2 entries) is kept,
+optionally in float32, and modes are kept as small integer codes instead of strings. For a 60-state
+model this cuts covariance storage by about 2x from packing and 4x with float32.
+
+Key Features:
+- Chunked storage: histories are split into chunks of chunk_size timesteps that are allocated on first write,
+  either in memory or as memory-mapped .npy files in a directory (so histories larger than RAM stay on disk).
+- Persistent histories: a store on disk keeps its layout in history.json and can be reopened with
+  HistoryStore.open, read-only or to continue recording. Existing chunk files are never overwritten.
+- Lazy reconstruction: full covariance matrices are only rebuilt for the timesteps that are read, a whole
+  chunk at a time for ranges.
+
+Main Class:
+- HistoryStore:
+    - open: Reopens a store saved in a directory.
+    - record: Stores the state, mode and covariance of one timestep.
+    - get_state / get_cov / get_mode: Reads one timestep (the covariance is unpacked to a full matrix).
+    - get_states / get_covs / get_modes: Reads a range of timesteps.
+Reading a timestep that was never recorded raises an IndexError.
+"""
+
+import os
+import json
+import numpy as np
+
+
+class HistoryStore:
+    def __init__(
+        self,
+        n_steps,
+        n_states,
+        modes,
+        dtype=np.float32,
+        store_cov=True,
+        path=None,
+        chunk_size=4096,
+        read_only=False,
+    ):
+        """
+        n_steps (int): Number of timesteps in the history.
+        n_states (int): Number of states.
+        modes (list): All modes of the system; modes are stored as their index in this list.
+        dtype (np.dtype): Storage type of the states and covariances (np.float32 or np.float64).
+        store_cov (bool): Whether covariances are stored (False e.g. for HybridSimulator histories).
+        path (str): Directory for memory-mapped chunk files. Chunks are kept in memory if None.
+            If the directory already holds a store with the same layout, recording continues into it.
+        chunk_size (int): Number of timesteps per chunk.
+        read_only (bool): Open the chunk files of an existing store read-only.
+        """
+        self._n_steps = n_steps
+        self._n_states = n_states
+        self._modes = list(modes)
+        self._mode_codes = {mode: code for code, mode in enumerate(self._modes)}
+        self._mode_dtype = np.uint8 if len(self._modes) <= np.iinfo(np.uint8).max + 1 else np.uint16
+        self._dtype = np.dtype(dtype)
+        self._store_cov = store_cov
+        self._path = path
+        self._chunk_size = chunk_size
+        self._read_only = read_only
+        self._triu_rows, self._triu_cols = np.triu_indices(n_states)
+        """ Position of every entry of the flattened full matrix within the packed upper triangle. """
+        unpack_index = np.zeros((n_states, n_states), dtype=np.intp)
+        unpack_index[self._triu_rows, self._triu_cols] = np.arange(len(self._triu_rows))
+        unpack_index[self._triu_cols, self._triu_rows] = np.arange(len(self._triu_rows))
+        self._unpack_index = unpack_index.ravel()
+        self._chunks = {}
+        if path is not None:
+            self._init_directory()
+
+    @classmethod
+    def open(cls, path, read_only=True):
+        """
+        Reopens the store saved in the directory path.
+        """
+        with open(os.path.join(path, "history.json")) as metadata_file:
+            metadata = json.load(metadata_file)
+        return cls(path=path, read_only=read_only, **metadata)
+
+    def _metadata(self):
+        return {
+            "n_steps": self._n_steps,
+            "n_states": self._n_states,
+            "modes": self._modes,
+            "dtype": self._dtype.str,
+            "store_cov": self._store_cov,
+            "chunk_size": self._chunk_size,
+        }
+
+    def _init_directory(self):
+        """
+        Writes the layout of a new store, or checks that an existing store has the same layout.
+        """
+        metadata_path = os.path.join(self._path, "history.json")
+        metadata = self._metadata()
+        if os.path.isfile(metadata_path):
+            with open(metadata_path) as metadata_file:
+                saved_metadata = json.load(metadata_file)
+            saved_metadata["dtype"] = np.dtype(saved_metadata["dtype"]).str
+            if saved_metadata != metadata:
+                raise ValueError(
+                    "The history in " + str(self._path) + " has a different layout: " + str(saved_metadata)
+                )
+        elif self._read_only:
+            raise FileNotFoundError("No history found in " + str(self._path))
+        else:
+            os.makedirs(self._path, exist_ok=True)
+            with open(metadata_path, "w") as metadata_file:
+                json.dump(metadata, metadata_file)
+
+    def _chunk_arrays(self, n_rows):
+        """
+        Name, shape and type of every array of a chunk with n_rows timesteps.
+        """
+        arrays = [
+            ("written", (n_rows,), np.bool_),
+            ("states", (n_rows, self._n_states), self._dtype),
+            ("modes", (n_rows,), self._mode_dtype),
+        ]
+        if self._store_cov:
+            arrays.append(("covs", (n_rows, len(self._triu_rows)), self._dtype))
+        return arrays
+
+    def _chunk_filename(self, name, chunk_idx):
+        return os.path.join(self._path, "%s_%05d.npy" % (name, chunk_idx))
+
+    def _get_chunk(self, chunk_idx, create=False):
+        """
+        Returns a chunk, loading it from disk if it was saved before.
+        Returns None for a chunk that was never written, unless create is True.
+        """
+        if chunk_idx in self._chunks:
+            return self._chunks[chunk_idx]
+        n_rows = min(self._chunk_size, self._n_steps - chunk_idx * self._chunk_size)
+        if self._path is not None and os.path.isfile(self._chunk_filename("written", chunk_idx)):
+            file_mode = "r" if self._read_only else "r+"
+            chunk = {
+                name: np.lib.format.open_memmap(self._chunk_filename(name, chunk_idx), mode=file_mode)
+                for name, _, _ in self._chunk_arrays(n_rows)
+            }
+        elif not create:
+            return None
+        elif self._path is None:
+            chunk = {name: np.zeros(shape, dtype=dtype) for name, shape, dtype in self._chunk_arrays(n_rows)}
+        else:
+            """ The "written" flags are created last, so a chunk only counts as saved once all of its arrays exist. """
+            chunk = {}
+            for name, shape, dtype in self._chunk_arrays(n_rows)[::-1]:
+                chunk[name] = np.lib.format.open_memmap(
+                    self._chunk_filename(name, chunk_idx), mode="w+", dtype=dtype, shape=shape
+                )
+        self._chunks[chunk_idx] = chunk
+        return chunk
+
+    def _check_step(self, step_idx):
+        if not 0 <= step_idx < self._n_steps:
+            raise IndexError("Step " + str(step_idx) + " is outside the history of " + str(self._n_steps) + " steps.")
+
+    def _read_chunk(self, step_idx):
+        """
+        Returns the chunk holding a recorded step and the row of the step within it.
+        """
+        self._check_step(step_idx)
+        chunk_idx, row = divmod(step_idx, self._chunk_size)
+        chunk = self._get_chunk(chunk_idx)
+        if chunk is None or not chunk["written"][row]:
+            raise IndexError("Step " + str(step_idx) + " has not been recorded.")
+        return chunk, row
+
+    def _read_ranges(self, start, stop):
+        """
+        Splits the recorded steps start to stop into (chunk, first row, last row + 1, output offset) per chunk.
+        """
+        if stop is None:
+            stop = self._n_steps
+        if not 0 <= start <= stop <= self._n_steps:
+            raise IndexError(
+                "Steps " + str(start) + " to " + str(stop) + " are outside the history of " + str(self._n_steps) + " steps."
+            )
+        ranges = []
+        if start == stop:
+            return ranges, 0
+        for chunk_idx in range(start // self._chunk_size, (stop - 1) // self._chunk_size + 1):
+            chunk_start = chunk_idx * self._chunk_size
+            row_start = max(start, chunk_start) - chunk_start
+            row_stop = min(stop, chunk_start + self._chunk_size) - chunk_start
+            chunk = self._get_chunk(chunk_idx)
+            if chunk is None or not np.all(chunk["written"][row_start:row_stop]):
+                missing = row_start if chunk is None else row_start + np.argmin(chunk["written"][row_start:row_stop])
+                raise IndexError("Step " + str(chunk_start + missing) + " has not been recorded.")
+            ranges.append((chunk, row_start, row_stop, chunk_start + row_start - start))
+        return ranges, stop - start
+
+    def _check_cov(self):
+        if not self._store_cov:
+            raise ValueError("This history does not store covariances (store_cov=False).")
+
+    def record(self, step_idx, state, mode, cov=None):
+        """
+        Stores one timestep. Only the upper triangle of cov is kept.
+        """
+        self._check_step(step_idx)
+        if self._read_only:
+            raise ValueError("The history is read-only.")
+        if self._store_cov and cov is None:
+            raise ValueError("This history stores covariances, so cov is required.")
+        chunk_idx, row = divmod(step_idx, self._chunk_size)
+        chunk = self._get_chunk(chunk_idx, create=True)
+        chunk["states"][row] = state
+        if self._store_cov:
+            chunk["covs"][row] = cov[self._triu_rows, self._triu_cols]
+        chunk["modes"][row] = self._mode_codes[mode]
+        chunk["written"][row] = True
+
+    def get_state(self, step_idx):
+        chunk, row = self._read_chunk(step_idx)
+        return chunk["states"][row].astype(np.float64)
+
+    def get_mode(self, step_idx):
+        chunk, row = self._read_chunk(step_idx)
+        return self._modes[chunk["modes"][row]]
+
+    def get_cov(self, step_idx):
+        """
+        Reconstructs the full covariance matrix of one timestep.
+        """
+        self._check_cov()
+        chunk, row = self._read_chunk(step_idx)
+        return chunk["covs"][row][self._unpack_index].astype(np.float64).reshape(self._n_states, self._n_states)
+
+    def get_states(self, start=0, stop=None):
+        """
+        Returns the states of timesteps start to stop as an (n_steps, n_states) array.
+        """
+        ranges, n_steps = self._read_ranges(start, stop)
+        states = np.zeros((n_steps, self._n_states))
+        for chunk, row_start, row_stop, offset in ranges:
+            states[offset:offset + row_stop - row_start] = chunk["states"][row_start:row_stop]
+        return states
+
+    def get_covs(self, start=0, stop=None):
+        """
+        Reconstructs the full covariances of timesteps start to stop as an (n_steps, n_states, n_states) array.
+        """
+        self._check_cov()
+        ranges, n_steps = self._read_ranges(start, stop)
+        covs = np.empty((n_steps, self._n_states * self._n_states))
+        for chunk, row_start, row_stop, offset in ranges:
+            covs[offset:offset + row_stop - row_start] = chunk["covs"][row_start:row_stop][:, self._unpack_index]
+        return covs.reshape(n_steps, self._n_states, self._n_states)
+
+    def get_modes(self, start=0, stop=None):
+        """
+        Returns the modes of timesteps start to stop as a list.
+        """
+        ranges, _ = self._read_ranges(start, stop)
+        modes = []
+        for chunk, row_start, row_stop, _ in ranges:
+            modes.extend(self._modes[code] for code in chunk["modes"][row_start:row_stop].tolist())
+        return modes
+
+    @property
+    def nbytes(self):
+        """
+        Number of bytes used by the loaded chunks.
+        """
+        return sum(array.nbytes for chunk in self._chunks.values() for array in chunk.values())
+
+    def flush(self):
+        """
+        Writes memory-mapped chunks to disk.
+        """
+        if self._path is not None and not self._read_only:
+            for chunk in self._chunks.values():
+                for array in chunk.values():
+                    array.flush()
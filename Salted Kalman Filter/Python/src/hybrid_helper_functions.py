@@ -10,11 +10,20 @@ Key Components:
   optionally adding Gaussian process noise.
 - `solve_ivp_guard_funcs`: Wraps hybrid guards into `solve_ivp` event functions for detecting mode transitions.
 - `solve_ivp_extract_hybrid_events`: Extracts hybrid events (mode switches) from a completed `solve_ivp` simulation.
+- `evaluate_hybrid_map`: Evaluates a reset or guard function, passing the time to time-varying ones.
+- `interpolate_surface`: Interpolants for a precomputed or logged moving contact surface.
+- `estimate_time_to_guard`: First-order estimate of the time until the state reaches a guard of its mode.
+- `integrate_free_flight`: Integrates several timesteps far from any guard without event detection, reporting the dt grid.
+- `detect_zeno`: Flags accumulating hybrid events (Zeno/chattering) so the caller can switch to a sticking mode.
+- `zeno_checked_mode`: Tracks the time between events of each transition and redirects into the sticking mode.
 - `compute_saltation_matrix`: Computes the saltation matrix used to propagate state uncertainty across
-  hybrid transitions (discontinuities).
+  hybrid transitions (discontinuities), either dense or factored as reset Jacobian plus a rank-one term.
+- `apply_saltation`: Propagates a covariance through a dense or factored saltation matrix.
 """
 
 import numpy as np
+from scipy import sparse
+from scipy.interpolate import CubicSpline
 
 def solve_ivp_dynamics_func(dynamics_dict, mode, inputs, dt, parameters, process_gaussian_noise = None):
     """
@@ -39,7 +48,7 @@ def solve_ivp_guard_funcs(guards_dict, mode, inputs, dt, parameters):
     new_modes = []
     if mode in guards_dict:
         for key, val in guards_dict[mode].items():
-            guard = lambda t, states: val["g"](t, states, inputs, dt, parameters)
+            guard = lambda t, states, val=val: val["g"](t, states, inputs, dt, parameters)
             guard.terminal = True
             guard.direction = -1
             guards.append(guard)
@@ -53,11 +62,139 @@ def solve_ivp_extract_hybrid_events(sol, possible_modes):
     """
     for idx in range(len(possible_modes)):
         """Assume we cannot activate multiple guards at once."""
-        if sol.t_events[idx]:
+        if len(sol.t_events[idx]) > 0:
             return sol.y_events[idx].flatten(), sol.t_events[idx], possible_modes[idx] # Flatten used here for compatibility — could replace with reshape if needed.
     return None, None, None
 
 
+def evaluate_hybrid_map(entry, key, t, states, inputs, dt, parameters):
+    """
+    Evaluates a reset or guard function ('r', 'R', 'Rt' or 'G') of one transition.
+    Entries flagged "time_varying" take the time as first argument, like 'g' and 'Gt' always do.
+    """
+    if entry.get("time_varying", False):
+        return entry[key](t, states, inputs, dt, parameters)
+    return entry[key](states, inputs, dt, parameters)
+
+
+def interpolate_surface(times, positions):
+    """
+    Builds interpolants for a precomputed (or logged) trajectory of a moving contact surface, so
+    time-varying guards and resets can evaluate it cheaply at any time.
+    The surface is a cubic spline, so the velocity and acceleration are the exact derivatives of the
+    position interpolant (as needed for consistent 'Gt' and 'Rt').
+    times (np.array): Sample times, increasing.
+    positions (np.array): Surface position at each sample time.
+    Returns (Tuple[callable, callable, callable]): Surface position, velocity and acceleration as functions of time.
+    """
+    spline = CubicSpline(np.asarray(times, dtype=float), np.asarray(positions, dtype=float))
+    return spline, spline.derivative(1), spline.derivative(2)
+
+
+def estimate_time_to_guard(dynamics_dict, guards_dict, mode, t, state, inputs, dt, parameters):
+    """
+    Estimates the time until the state reaches any guard of the current mode from the guard values
+    and their rates of change G @ f + Gt. This is a first-order estimate, so use it with a safety factor.
+    Returns np.inf if no guard is being approached.
+    """
+    time_to_guard = np.inf
+    if mode not in guards_dict:
+        return time_to_guard
+    f = dynamics_dict[mode]["f_cont"](state, inputs, dt, parameters).reshape(np.shape(state))
+    for guard in guards_dict[mode].values():
+        g = np.ravel(guard["g"](t, state, inputs, dt, parameters))[0]
+        g_rate = np.ravel(
+            evaluate_hybrid_map(guard, "G", t, state, inputs, dt, parameters) @ f + guard["Gt"](t, state, inputs, dt, parameters)
+        )[0]
+        if g <= 0:
+            return 0.0
+        if g_rate < 0:
+            time_to_guard = min(time_to_guard, -g / g_rate)
+    return time_to_guard
+
+
+def integrate_free_flight(
+    integrator, dynamics_func, guard_funcs, start_time, start_state, dt, n_steps, process_noise=None
+):
+    """
+    Integrates n_steps timesteps in one integrator call without event detection and returns the states
+    on the dt grid (one row per timestep). Stops before the first grid state past a guard, so the caller
+    can redo that timestep with event detection.
+    process_noise (np.array): Optional (n_steps, n_states) noise added to the dynamics, constant within each
+        timestep. Each timestep is then integrated in its own call, so no stage mixes two noise samples.
+    """
+    grid = start_time + dt * np.arange(1, n_steps + 1)
+    if process_noise is None:
+        sol = integrator(dynamics_func, [start_time, grid[-1]], start_state, t_eval=grid)
+        grid_states = sol.y.T
+    else:
+        grid_states = np.zeros((n_steps, np.size(start_state)))
+        state = start_state
+        for idx in range(n_steps):
+            sol = integrator(
+                lambda t, states, noise=process_noise[idx]: dynamics_func(t, states) + noise,
+                [grid[idx] - dt, grid[idx]],
+                state,
+            )
+            grid_states[idx] = sol.y[:, -1]
+            state = grid_states[idx]
+    for idx in range(n_steps):
+        for guard in guard_funcs:
+            if np.ravel(guard(grid[idx], grid_states[idx]))[0] <= 0:
+                return grid_states[:idx]
+    return grid_states
+
+
+def detect_zeno(n_step_events, event_interval, max_events_per_step=None, min_event_interval=None):
+    """
+    Checks whether hybrid events are accumulating (Zeno/chattering).
+    n_step_events (int): Number of hybrid events seen so far in the current timestep.
+    event_interval (float): Time since the previous hybrid event (None if there is none).
+    max_events_per_step (int): Maximum number of events allowed within one timestep.
+    min_event_interval (float): Smallest allowable time between consecutive events.
+    Non-positive intervals (events recorded out of order, or at the same time) never count as accumulating.
+    """
+    if max_events_per_step is not None and n_step_events > max_events_per_step:
+        return True
+    if (
+        min_event_interval is not None
+        and event_interval is not None
+        and 0 < event_interval < min_event_interval
+    ):
+        return True
+    return False
+
+
+def zeno_checked_mode(
+    last_event_times,
+    current_mode,
+    new_mode,
+    event_time,
+    n_step_events,
+    zeno_modes,
+    max_events_per_step=None,
+    min_event_interval=None,
+):
+    """
+    Returns the mode to transition into for an event at event_time.
+    Redirects into the declared sticking mode (zeno_modes[current_mode]) once events are accumulating.
+    Intervals are measured between events of the same transition (e.g. impact to impact);
+    last_event_times maps (current_mode, new_mode) to the latest event time and is updated in place.
+    """
+    transition = (current_mode, new_mode)
+    last_event_time = last_event_times.get(transition)
+    event_interval = None
+    if last_event_time is not None:
+        event_interval = event_time - last_event_time
+    if last_event_time is None or event_time > last_event_time:
+        last_event_times[transition] = event_time
+    if current_mode in zeno_modes and detect_zeno(
+        n_step_events, event_interval, max_events_per_step, min_event_interval
+    ):
+        return zeno_modes[current_mode]
+    return new_mode
+
+
 def compute_saltation_matrix(
     t,
     pre_event_state,
@@ -70,24 +207,32 @@ def compute_saltation_matrix(
     resets_dict,
     guards_dict,
     post_event_state=None,
+    event_mode=None,
+    factored=False,
 ):
     """
     Computes the saltation matrix.
-    Note: Saltation matrix currently assumes time-invariant reset and guard maps.
+    event_mode is the mode of the guard that triggered the event, if it differs from post_mode
+    (e.g. when a chattering impact is redirected into a sticking mode).
+    If factored is True, returns (DxR, u, v) such that the saltation matrix is DxR + outer(u, v).
+    Time-varying guards enter through 'Gt'; time-varying resets may provide 'Rt', the time derivative of 'r'.
     """
+    if event_mode is None:
+        event_mode = post_mode
+
     if post_event_state is None:
         """ Compute reset if not post event state is given. """
-        post_event_state = resets_dict[pre_mode][post_mode]['r'](
-            pre_event_state, inputs, dt, parameters
+        post_event_state = evaluate_hybrid_map(
+            resets_dict[pre_mode][post_mode], 'r', t, pre_event_state, inputs, dt, parameters
         ).reshape(np.shape(pre_event_state))
     
-    DxR = resets_dict[pre_mode][post_mode]['R'](
-        pre_event_state, inputs, dt, parameters
+    DxR = evaluate_hybrid_map(
+        resets_dict[pre_mode][post_mode], 'R', t, pre_event_state, inputs, dt, parameters
     )
-    DxG = guards_dict[pre_mode][post_mode]['G'](
-        pre_event_state, inputs, dt, parameters
+    DxG = evaluate_hybrid_map(
+        guards_dict[pre_mode][event_mode], 'G', t, pre_event_state, inputs, dt, parameters
     )
-    DtG = guards_dict[pre_mode][post_mode]['Gt'](
+    DtG = guards_dict[pre_mode][event_mode]['Gt'](
         t, pre_event_state, inputs, dt, parameters
     )
     f_pre = dynamics_dict[pre_mode]['f_cont'](
@@ -96,6 +241,40 @@ def compute_saltation_matrix(
     f_post = dynamics_dict[post_mode]['f_cont'](
         post_event_state, inputs, dt, parameters
     ).reshape(np.shape(pre_event_state))
+    DtR = np.zeros(np.shape(pre_event_state))
+    if 'Rt' in resets_dict[pre_mode][post_mode]:
+        DtR = evaluate_hybrid_map(
+            resets_dict[pre_mode][post_mode], 'Rt', t, pre_event_state, inputs, dt, parameters
+        ).reshape(np.shape(pre_event_state))
+
+    if factored:
+        v = np.ravel(DxG)
+        u = (f_post - DxR@f_pre - DtR)/np.ravel(DtG + v@f_pre)[0]
+        return DxR, u, v
 
-    salt = DxR + np.outer((f_post - DxR@f_pre),DxG)/(DtG + DxG@f_pre)
+    salt = DxR + np.outer((f_post - DxR@f_pre - DtR),DxG)/(DtG + DxG@f_pre)
     return salt
+
+
+def apply_saltation(salt, cov):
+    """
+    Propagates the covariance through the saltation matrix: salt @ cov @ salt.T.
+    salt is either a dense matrix or the factored (DxR, u, v) form from compute_saltation_matrix.
+    The factored form expands (R + u v^T) P (R + u v^T)^T into R P R^T plus rank-one terms,
+    which avoids dense n x n products whenever the reset Jacobian R is the identity or sparse.
+    """
+    if not isinstance(salt, tuple):
+        return salt @ cov @ salt.T
+
+    DxR, u, v = salt
+    Pv = cov @ v
+    if sparse.issparse(DxR):
+        RPRt = np.asarray(DxR @ (DxR @ cov).T).T
+        w = DxR @ Pv
+    elif np.array_equal(DxR, np.eye(np.shape(cov)[0])):
+        RPRt = cov.copy()
+        w = Pv
+    else:
+        RPRt = DxR @ cov @ DxR.T
+        w = DxR @ Pv
+    return RPRt + np.outer(w, u) + np.outer(u, w) + (v @ Pv) * np.outer(u, u)
@@ -15,6 +15,7 @@ Key Features:
 Main Class:
 - HybridSimulator:
     - simulate_timestep: advances the system by one timestep (handling any hybrid transitions).
+    - simulate_timesteps: advances the system by several timesteps, integrating timesteps far from any guard in one call.
     - get_measurement: returns the current measurement with optional Gaussian measurement noise.
     - get_state: returns a copy of the current system state.
 """
@@ -25,10 +26,14 @@ from src.hybrid_helper_functions import (
     solve_ivp_dynamics_func,
     solve_ivp_guard_funcs,
     solve_ivp_extract_hybrid_events,
+    zeno_checked_mode,
+    evaluate_hybrid_map,
+    estimate_time_to_guard,
+    integrate_free_flight,
 )
 
 class HybridSimulator:
-    def __init__(self,init_state,init_mode,dt,noise_matrices,dynamics,resets, guards, parameters):
+    def __init__(self,init_state,init_mode,dt,noise_matrices,dynamics,resets, guards, parameters, zeno_modes=None, max_events_per_step=None, min_event_interval=None, integrator=solve_ivp):
         """
         init_state (np.array): Initial state.
         noise_matrices (np.array): Noise matrices for each mode.
@@ -36,6 +41,10 @@ class HybridSimulator:
         resets (dict): Resets for each allowable transition.
         guards (dict): Guards for each allowable transition.
         parameters (np.array): Extra parameters of the system.
+        zeno_modes (dict): Sticking mode to switch to from each mode once events accumulate (Zeno/chattering).
+        max_events_per_step (int): Number of events within one timestep that counts as accumulating.
+        min_event_interval (float): Time between consecutive events of the same transition below which they count as accumulating.
+        integrator (callable): solve_ivp-compatible integrator, e.g. numba_backend.fixed_step_solve.
         """
         self._current_state = init_state
         self._current_mode = init_mode
@@ -46,9 +55,29 @@ class HybridSimulator:
         self._parameters = parameters
         self._noise_matrices = noise_matrices
         self._n_states = np.shape(self._current_state)[0]
+        self._zeno_modes = zeno_modes if zeno_modes is not None else {}
+        self._max_events_per_step = max_events_per_step
+        self._min_event_interval = min_event_interval
+        self._last_event_times = {}
+        self._integrator = integrator
         
 
 
+    def _check_zeno(self, event_time, new_mode, n_step_events):
+        """
+        Returns the mode to transition into for an event at event_time (see zeno_checked_mode).
+        """
+        return zeno_checked_mode(
+            self._last_event_times,
+            self._current_mode,
+            new_mode,
+            event_time,
+            n_step_events,
+            self._zeno_modes,
+            self._max_events_per_step,
+            self._min_event_interval,
+        )
+
     def simulate_timestep(self, current_time, inputs):
         """
         Simulates for one dt.
@@ -68,7 +97,7 @@ class HybridSimulator:
             self._guards_dict, self._current_mode, inputs, self._dt, self._parameters
         )
 
-        sol = solve_ivp(
+        sol = self._integrator(
             current_dynamics,
             [current_time, end_time],
             self._current_state,
@@ -83,10 +112,22 @@ class HybridSimulator:
             new_mode,
         ) = solve_ivp_extract_hybrid_events(sol, possible_modes)
 
+        n_step_events = 0
         while new_mode is not None:
+            """ If events are accumulating (Zeno/chattering), switch to the declared sticking mode instead. """
+            event_mode = new_mode
+            n_step_events += 1
+            new_mode = self._check_zeno(hybrid_event_time[0], new_mode, n_step_events)
+
             """Apply reset."""
-            current_state = self._resets_dict[self._current_mode][new_mode]['r'](
-                hybrid_event_state, inputs, self._dt, self._parameters
+            current_state = evaluate_hybrid_map(
+                self._resets_dict[self._current_mode][new_mode],
+                'r',
+                hybrid_event_time[0],
+                hybrid_event_state,
+                inputs,
+                self._dt,
+                self._parameters,
             ).reshape(np.shape(hybrid_event_state))
 
             """ Update guard and simulate. """
@@ -105,7 +146,7 @@ class HybridSimulator:
                 self._dt,
                 self._parameters,
             )
-            sol = solve_ivp(
+            sol = self._integrator(
                 current_dynamics,
                 [hybrid_event_time, end_time],
                 current_state,
@@ -124,6 +165,68 @@ class HybridSimulator:
 
         self._current_state = current_state
 
+    def simulate_timesteps(self, current_time, inputs, n_steps, safety_factor=2.0):
+        """
+        Simulates for n_steps timesteps and returns the states on the dt grid.
+        While the estimated time to the nearest guard exceeds safety_factor timesteps, those timesteps are
+        integrated without event detection (process noise is still sampled per timestep and held constant within it).
+        Timesteps near a predicted crossing use simulate_timestep.
+        """
+        states = np.zeros((n_steps, self._n_states))
+        step_idx = 0
+        while step_idx < n_steps:
+            step_time = current_time + step_idx * self._dt
+            n_remaining = n_steps - step_idx
+
+            """ Number of timesteps that are safely away from the guards. """
+            time_to_guard = estimate_time_to_guard(
+                self._dynamics_dict,
+                self._guards_dict,
+                self._current_mode,
+                step_time,
+                self._current_state,
+                inputs,
+                self._dt,
+                self._parameters,
+            )
+            if time_to_guard >= n_remaining * safety_factor * self._dt:
+                n_free = n_remaining
+            else:
+                n_free = int(time_to_guard / (safety_factor * self._dt))
+
+            grid_states = np.zeros((0, self._n_states))
+            if n_free > 1:
+                process_noise = np.random.multivariate_normal(
+                    np.zeros(self._n_states), self._noise_matrices[self._current_mode]['W'], size=n_free
+                )
+                current_dynamics = solve_ivp_dynamics_func(
+                    self._dynamics_dict, self._current_mode, inputs, self._dt, self._parameters
+                )
+                current_guards, _ = solve_ivp_guard_funcs(
+                    self._guards_dict, self._current_mode, inputs, self._dt, self._parameters
+                )
+                grid_states = integrate_free_flight(
+                    self._integrator,
+                    current_dynamics,
+                    current_guards,
+                    step_time,
+                    self._current_state,
+                    self._dt,
+                    n_free,
+                    process_noise=process_noise,
+                )
+
+            if len(grid_states) > 0:
+                states[step_idx:step_idx + len(grid_states)] = grid_states
+                self._current_state = grid_states[-1].copy()
+                step_idx += len(grid_states)
+            else:
+                self.simulate_timestep(step_time, inputs)
+                states[step_idx] = self._current_state
+                step_idx += 1
+
+        return states
+
     def get_measurement(self, measurement_noise_flag = False):
         """Return noisy or noise-free measurement depending on flag (for testing)"""
         measurement = self._dynamics_dict[self._current_mode]['y'](
@@ -140,4 +243,8 @@ class HybridSimulator:
             return measurement + np.random.multivariate_normal(measurement_gaussian_noise["mean"], measurement_gaussian_noise["cov"])
     
     def get_state(self):
-        return self._current_state.copy()
\ No newline at end of file
+        return self._current_state.copy()
+
+    def get_mode(self):
+        """Return the current mode."""
+        return self._current_mode
@@ -0,0 +1,67 @@
+"""
+kernel_codegen.py
+
+This module turns SymPy model expressions into NumPy kernels written to a Python module on disk, as a
+drop-in replacement for `sp.lambdify` in the model scripts. The generated kernels fill preallocated float
+arrays entry by entry, so every kernel returns a uniformly typed array (lambdified matrices that mix integer
+and float entries cannot be compiled by Numba), and because they are defined in a real file, Numba can cache
+their compiled versions to disk (see numba_backend.py).
+
+Key Components:
+- `lambdify_kernels`: Generates the kernels of a model into one module and returns them by name.
+  Matrix arguments are unpacked entry by entry and matrix results keep the shape `sp.lambdify` returns.
+"""
+
+import sys
+import pathlib
+import sympy as sp
+from sympy.printing.numpy import NumPyPrinter
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from src.numba_backend import write_generated_module
+
+
+def _kernel_source(name, args, expr, printer):
+    """
+    Source of one kernel name(*args) returning expr.
+    """
+    arg_names = []
+    lines = []
+    for arg_idx, arg in enumerate(args):
+        if isinstance(arg, sp.MatrixBase):
+            arg_name = "_arg%d" % arg_idx
+            for entry_idx, symbol in enumerate(arg):
+                lines.append("    %s = %s[%d]" % (printer.doprint(symbol), arg_name, entry_idx))
+        else:
+            arg_name = printer.doprint(arg)
+        if not arg_name.isidentifier():
+            raise ValueError("Kernel " + name + " has an argument that is not a valid name: " + arg_name)
+        arg_names.append(arg_name)
+
+    if isinstance(expr, sp.MatrixBase):
+        lines.append("    _out = numpy.zeros(%r)" % (expr.shape,))
+        for row in range(expr.rows):
+            for col in range(expr.cols):
+                if expr[row, col] != 0:
+                    lines.append("    _out[%d, %d] = %s" % (row, col, printer.doprint(expr[row, col])))
+        lines.append("    return _out")
+    else:
+        lines.append("    return float(%s)" % printer.doprint(expr))
+    return "def %s(%s):\n" % (name, ", ".join(arg_names)) + "\n".join(lines) + "\n"
+
+
+def lambdify_kernels(kernels, modules=None, directory=None):
+    """
+    Generates NumPy kernels from SymPy expressions into one module on disk and imports it.
+    kernels (dict): Kernel name -> (args, expr), with args and expr as for sp.lambdify(args, expr).
+    modules (dict): Functions called by name in the expressions (e.g. surface interpolants), made available to
+        the generated module. Kernels that call them run in NumPy only.
+    directory (str): Directory of the generated module (numba_backend.GENERATED_DIR by default).
+    Returns (dict): Kernel name -> generated function.
+    """
+    printer = NumPyPrinter({"fully_qualified_modules": True, "allow_unknown_functions": True})
+    source = '"""\nModel kernels generated by kernel_codegen.lambdify_kernels; do not edit.\n"""\n\nimport numpy\n'
+    for name, (args, expr) in kernels.items():
+        source += "\n\n" + _kernel_source(name, args, expr, printer)
+    module = write_generated_module(source, "kernels", directory=directory, namespace=modules)
+    return {name: getattr(module, name) for name in kernels}
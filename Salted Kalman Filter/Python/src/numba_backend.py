@@ -0,0 +1,647 @@
+"""
+numba_backend.py
+
+This module provides an optional faster execution path for the SKF and HybridSimulator.
+Most of the time per filter step is spent in `solve_ivp` overhead and in Python-level calls of the model
+kernels, so this backend replaces the adaptive integrator with a fixed-step one and JIT-compiles the
+model kernels with Numba when it is installed. Without Numba everything runs as plain NumPy code.
+
+Key Components:
+- `NUMBA_AVAILABLE`: Whether Numba could be imported.
+- `jit`: Decorator compiling a function in nopython mode (cached to disk), or returning it unchanged.
+- `jit_model`: Returns copies of the `dynamics`/`resets`/`guards` dicts with every kernel JIT-compiled.
+  Kernels Numba cannot compile (e.g. lambdified SymPy output that mixes integer and float entries) keep
+  running as Python functions.
+- `fixed_step_solve`: A `solve_ivp`-compatible RK4 integrator with a fixed number of substeps and
+  event location by bisection. Pass it as the `integrator` of SKF/HybridSimulator
+  (e.g. `functools.partial(fixed_step_solve, n_substeps=5)`).
+- `CompiledSKF`: An SKF whose integrator with event location, covariance propagation, saltation and
+  measurement update run as nopython functions generated per mode and per transition over the compiled
+  model kernels. Python only dispatches on the mode, applies Zeno checks and loops over hybrid events.
+  The model kernels must be module-level functions, e.g. generated from SymPy by kernel_codegen.py.
+  If Numba is missing or any kernel fails to compile, the whole filter falls back to the NumPy path
+  (SKF with `fixed_step_solve`).
+- `write_generated_module`: Writes generated source to a module in `GENERATED_DIR` and imports it. Generated
+  functions live in real files, so Numba caches their compiled code to disk and later processes skip compilation.
+
+See scripts/benchmark_numba_backend.py for a comparison with the default `solve_ivp` path.
+"""
+
+import os
+import sys
+import pathlib
+import hashlib
+import inspect
+import importlib.util
+import functools
+import warnings
+import numpy as np
+
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    numba = None
+    NUMBA_AVAILABLE = False
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from src.skf import SKF
+
+""" Generated modules (see write_generated_module) are kept next to Python's own bytecode cache. """
+GENERATED_DIR = str(pathlib.Path(__file__).parent / "__pycache__" / "generated")
+
+
+def jit(func):
+    """
+    Compiles func in nopython mode with on-disk caching if Numba is available, otherwise returns func.
+    """
+    if not NUMBA_AVAILABLE:
+        return func
+    return numba.njit(cache=True)(func)
+
+
+def _jit_or_fallback(func, owner=None, key=None):
+    """
+    Wraps func so its first call tries the Numba-compiled version and permanently falls back to
+    the Python function if Numba cannot compile it. Once a version is selected, the wrapper replaces
+    itself in owner[key], so later calls through the model dict go straight to that version.
+    """
+    if not NUMBA_AVAILABLE:
+        return func
+    """ Only kernels defined in a real file can be cached to disk (not e.g. lambdified ones). """
+    jitted = numba.njit(cache=os.path.isfile(func.__code__.co_filename))(func)
+    selected = []
+
+    def select(version):
+        selected.append(version)
+        if owner is not None:
+            owner[key] = version
+
+    def kernel(*args):
+        if selected:
+            return selected[0](*args)
+        try:
+            result = jitted(*args)
+        except Exception:
+            """ Numba reports compilation failures with several exception types; if the Python
+            function fails as well, the error is genuine and is raised from there. """
+            result = func(*args)
+            select(func)
+            return result
+        select(jitted)
+        return result
+
+    kernel.py_func = func
+    return kernel
+
+
+def jit_model(dynamics, resets, guards):
+    """
+    Returns copies of the dynamics, resets and guards dicts with every kernel JIT-compiled.
+    Non-callable entries (e.g. sparsity patterns) are copied unchanged.
+    """
+    def jit_entries(funcs):
+        jitted = {}
+        for key, val in funcs.items():
+            jitted[key] = _jit_or_fallback(val, jitted, key) if callable(val) else val
+        return jitted
+
+    jit_dynamics = {mode: jit_entries(funcs) for mode, funcs in dynamics.items()}
+    jit_resets = {
+        pre_mode: {post_mode: jit_entries(funcs) for post_mode, funcs in resets[pre_mode].items()}
+        for pre_mode in resets
+    }
+    jit_guards = {
+        pre_mode: {post_mode: jit_entries(funcs) for post_mode, funcs in guards[pre_mode].items()}
+        for pre_mode in guards
+    }
+    return jit_dynamics, jit_resets, jit_guards
+
+
+def _rk4_step(fun, t, states, h):
+    """
+    One classical Runge-Kutta step of size h.
+    """
+    k1 = np.asarray(fun(t, states), dtype=float)
+    k2 = np.asarray(fun(t + 0.5 * h, states + 0.5 * h * k1), dtype=float)
+    k3 = np.asarray(fun(t + 0.5 * h, states + 0.5 * h * k2), dtype=float)
+    k4 = np.asarray(fun(t + h, states + h * k3), dtype=float)
+    return states + h / 6.0 * (k1 + 2.0 * k2 + 2.0 * k3 + k4)
+
+
+def _event_value(event, t, states):
+    return np.ravel(event(t, states))[0]
+
+
+def _crosses(event, g_start, g_end):
+    """
+    Whether the event function crosses zero between two values in the event's direction.
+    """
+    direction = getattr(event, "direction", 0)
+    if direction < 0:
+        return g_start > 0 and g_end <= 0
+    if direction > 0:
+        return g_start < 0 and g_end >= 0
+    return np.sign(g_start) != np.sign(g_end)
+
+
+class FixedStepSolution:
+    """
+    Mirrors the fields of the solve_ivp result used by the SKF and HybridSimulator.
+    """
+    def __init__(self, t, y, t_events, y_events):
+        self.t = t
+        self.y = y
+        self.t_events = t_events
+        self.y_events = y_events
+
+
+def fixed_step_solve(fun, t_span, y0, events=(), n_substeps=10, n_bisections=30, t_eval=None):
+    """
+    Integrates fun over t_span with n_substeps RK4 steps, stopping at the first terminal event.
+    If t_eval is given (without events), the whole span is integrated in one pass with steps no longer
+    than the span / n_substeps, shortened so that they land on every time in t_eval, and only the states
+    at t_eval are returned.
+    fun (callable): Dynamics fun(t, states), as for solve_ivp.
+    t_span (list): Start and end time.
+    y0 (np.array): Initial state.
+    events (list): Event functions event(t, states) with optional terminal/direction attributes.
+    n_substeps (int): Number of RK4 steps over the full span.
+    n_bisections (int): Bisection iterations used to locate an event within a substep.
+    """
+    if t_eval is not None:
+        t = float(np.ravel(t_span[0])[0])
+        t_end = float(np.ravel(t_span[1])[0])
+        max_step = (t_end - t) / n_substeps
+        states = np.asarray(y0, dtype=float).flatten()
+        ys = np.zeros((len(t_eval), np.shape(states)[0]))
+        for eval_idx, t_next in enumerate(t_eval):
+            n_steps = max(1, int(np.ceil((t_next - t) / max_step - 1e-9)))
+            h = (t_next - t) / n_steps
+            for _ in range(n_steps):
+                states = _rk4_step(fun, t, states, h)
+                t = t + h
+            t = t_next
+            ys[eval_idx] = states
+        return FixedStepSolution(np.asarray(t_eval), ys.T, [], [])
+
+    t_start = float(np.ravel(t_span[0])[0])
+    t_end = float(np.ravel(t_span[1])[0])
+    h = (t_end - t_start) / n_substeps
+    states = np.asarray(y0, dtype=float).flatten()
+    n_states = np.shape(states)[0]
+
+    ts = [t_start]
+    ys = [states]
+    t_events = [np.empty(0) for _ in events]
+    y_events = [np.empty((0, n_states)) for _ in events]
+    g_prev = [_event_value(event, t_start, states) for event in events]
+
+    t = t_start
+    for _ in range(n_substeps):
+        next_states = _rk4_step(fun, t, states, h)
+        g_next = [_event_value(event, t + h, next_states) for event in events]
+
+        """ Locate the earliest crossing within this substep by bisection on the step length. """
+        first_idx, first_tau, first_states = None, h, next_states
+        for event_idx, event in enumerate(events):
+            if not _crosses(event, g_prev[event_idx], g_next[event_idx]):
+                continue
+            low, high = 0.0, h
+            high_states = next_states
+            for _ in range(n_bisections):
+                mid = 0.5 * (low + high)
+                mid_states = _rk4_step(fun, t, states, mid)
+                if _crosses(event, g_prev[event_idx], _event_value(event, t + mid, mid_states)):
+                    high, high_states = mid, mid_states
+                else:
+                    low = mid
+            if first_idx is None or high < first_tau:
+                first_idx, first_tau, first_states = event_idx, high, high_states
+
+        if first_idx is not None:
+            t_events[first_idx] = np.append(t_events[first_idx], t + first_tau)
+            y_events[first_idx] = np.vstack([y_events[first_idx], first_states])
+            if getattr(events[first_idx], "terminal", False):
+                ts.append(t + first_tau)
+                ys.append(first_states)
+                break
+
+        t = t + h
+        states = next_states
+        g_prev = g_next
+        ts.append(t)
+        ys.append(states)
+
+    return FixedStepSolution(np.array(ts), np.array(ys).T, t_events, y_events)
+
+
+def _as_vector(x):
+    """
+    Kernel output as a flat float vector.
+    """
+    return np.asarray(x, dtype=np.float64).ravel()
+
+
+def _as_matrix(x):
+    """
+    Kernel output as a float matrix.
+    """
+    return np.asarray(x, dtype=np.float64)
+
+
+def _as_scalar(x):
+    """
+    Kernel output (scalar or 1 x 1 array) as a float.
+    """
+    return float(np.ravel(x)[0])
+
+
+if NUMBA_AVAILABLE:
+    """ Kernels return scalars, (n,) or (n, 1) arrays, of float or integer type. """
+    @numba.extending.overload(_as_vector)
+    def _as_vector_overload(x):
+        if isinstance(x, numba.types.Array):
+            return lambda x: np.ascontiguousarray(x).ravel().astype(np.float64)
+
+    @numba.extending.overload(_as_matrix)
+    def _as_matrix_overload(x):
+        if isinstance(x, numba.types.Array):
+            return lambda x: np.ascontiguousarray(x).astype(np.float64)
+
+    @numba.extending.overload(_as_scalar)
+    def _as_scalar_overload(x):
+        if isinstance(x, numba.types.Array):
+            return lambda x: np.float64(x.flat[0])
+        if isinstance(x, numba.types.Number):
+            return lambda x: np.float64(x)
+
+
+def write_generated_module(source, prefix, directory=None, namespace=None):
+    """
+    Writes generated source to a module in directory (GENERATED_DIR by default) and imports it.
+    The module is named after a hash of its source, so an existing file is reused unchanged and Numba's
+    on-disk cache of its functions stays valid across processes.
+    namespace (dict): Extra globals of the module (e.g. interpolants called by generated kernels).
+    """
+    if directory is None:
+        directory = GENERATED_DIR
+    module_name = "%s_%s" % (prefix, hashlib.sha1(source.encode()).hexdigest()[:16])
+    module = sys.modules.get(module_name)
+    if module is None:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, module_name + ".py")
+        if not os.path.isfile(path):
+            """ Write to a temporary file first, so concurrent processes never import a partial module. """
+            temporary_path = "%s.%d.tmp" % (path, os.getpid())
+            with open(temporary_path, "w") as module_file:
+                module_file.write(source)
+            os.replace(temporary_path, path)
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+    if namespace:
+        module.__dict__.update(namespace)
+    return module
+
+
+def _as_dispatcher(func):
+    """
+    Returns func compiled in nopython mode with on-disk caching (unchanged if it already is a Numba function).
+    """
+    if isinstance(func, numba.core.dispatcher.Dispatcher):
+        return func
+    return numba.njit(cache=True)(func)
+
+
+def _kernel_reference(func):
+    """
+    Returns the module and name a model kernel can be imported from (unwrapping jit_model kernels).
+    """
+    func = getattr(func, "py_func", func)
+    module = sys.modules.get(getattr(func, "__module__", None) or "")
+    name = getattr(func, "__name__", "")
+    attribute = getattr(module, name, None)
+    if attribute is not func and getattr(attribute, "py_func", None) is not func:
+        raise ValueError(
+            "CompiledSKF needs model kernels defined at module level (e.g. by kernel_codegen.lambdify_kernels), "
+            "not " + repr(func)
+        )
+    return module.__name__, name
+
+
+_STEP_MODULE_HEADER = '''"""
+Nopython step functions of one CompiledSKF model, generated by numba_backend.py; do not edit.
+Sources of the backend and the model kernels: {digest}
+"""
+
+import numpy as np
+import numba
+from {backend} import _as_vector, _as_matrix, _as_scalar, _as_dispatcher
+'''
+
+_KERNEL_TEMPLATE = '''
+from {module} import {name} as _kernel_{idx}
+kernel_{idx} = _as_dispatcher(_kernel_{idx})
+'''
+
+_MODE_TEMPLATE = '''
+
+@numba.njit(cache=True)
+def guard_values_{mode}(t, states, inputs, dt, parameters):
+    values = np.empty({n_guards})
+{guard_lines}
+    return values
+
+
+@numba.njit(cache=True)
+def rk4_step_{mode}(states, h, inputs, dt, parameters):
+    k1 = _as_vector({f_cont}(states, inputs, dt, parameters))
+    k2 = _as_vector({f_cont}(states + 0.5 * h * k1, inputs, dt, parameters))
+    k3 = _as_vector({f_cont}(states + 0.5 * h * k2, inputs, dt, parameters))
+    k4 = _as_vector({f_cont}(states + h * k3, inputs, dt, parameters))
+    return states + h / 6.0 * (k1 + 2.0 * k2 + 2.0 * k3 + k4)
+
+
+@numba.njit(cache=True, error_model="numpy")
+def predict_segment_{mode}(t_start, t_end, states, cov, W, inputs, dt, parameters, n_substeps, n_bisections):
+    h = (t_end - t_start) / n_substeps
+    t = t_start
+    current_states = states
+    g_prev = guard_values_{mode}(t, current_states, inputs, dt, parameters)
+    event_idx = -1
+    for _ in range(n_substeps):
+        next_states = rk4_step_{mode}(current_states, h, inputs, dt, parameters)
+        g_next = guard_values_{mode}(t + h, next_states, inputs, dt, parameters)
+        event_tau = h
+        event_states = next_states
+        for guard_idx in range(g_next.shape[0]):
+            """ Guards are crossed from positive to non-positive values, as for solve_ivp with direction -1. """
+            if not (g_prev[guard_idx] > 0 and g_next[guard_idx] <= 0):
+                continue
+            low = 0.0
+            high = h
+            high_states = next_states
+            for _ in range(n_bisections):
+                mid = 0.5 * (low + high)
+                mid_states = rk4_step_{mode}(current_states, mid, inputs, dt, parameters)
+                if guard_values_{mode}(t + mid, mid_states, inputs, dt, parameters)[guard_idx] <= 0:
+                    high = mid
+                    high_states = mid_states
+                else:
+                    low = mid
+            if event_idx < 0 or high < event_tau:
+                event_idx = guard_idx
+                event_tau = high
+                event_states = high_states
+        if event_idx >= 0:
+            t = t + event_tau
+            current_states = event_states
+            break
+        t = t + h
+        current_states = next_states
+        g_prev = g_next
+
+    A = _as_matrix({A_disc}(states, inputs, t - t_start, parameters))
+    return t, current_states, A @ cov @ A.T + W, event_idx
+
+
+@numba.njit(cache=True)
+def measurement_update_{mode}(states, cov, measurement, V, parameters):
+    C_matrix = _as_matrix({C}(states, parameters))
+    residual = measurement - _as_vector({y}(states, parameters))
+    CP = C_matrix @ cov
+    KT = np.linalg.solve(CP @ C_matrix.T + V, CP)
+    K = np.ascontiguousarray(KT.T)
+    return states + K @ residual, cov - K @ CP
+'''
+
+_TRANSITION_TEMPLATE = '''
+
+@numba.njit(cache=True, error_model="numpy")
+def transition_{transition}(t, states, cov, inputs, dt, parameters):
+    post_states = _as_vector({r})
+    DxR = _as_matrix({R})
+    DtR = _as_vector({Rt})
+    DxG = _as_vector({G})
+    DtG = _as_scalar({Gt}(t, states, inputs, dt, parameters))
+    f_pre_event = _as_vector({f_pre}(states, inputs, dt, parameters))
+    f_post_event = _as_vector({f_post}(post_states, inputs, dt, parameters))
+    salt = DxR + np.outer(f_post_event - DxR @ f_pre_event - DtR, DxG) / (DtG + np.dot(DxG, f_pre_event))
+    return post_states, salt @ cov @ salt.T
+'''
+
+
+class CompiledSKF(SKF):
+    def __init__(self, *args, n_substeps=10, n_bisections=30, **kwargs):
+        """
+        Takes the same arguments as SKF, plus:
+        n_substeps (int): Number of RK4 steps per timestep (and per segment after a hybrid event).
+        n_bisections (int): Bisection iterations used to locate a guard crossing within a substep.
+        The integrator defaults to fixed_step_solve with the same settings; it is used by the NumPy
+        fallback and by predict_steps. The compiled path always applies the dense saltation matrix.
+        """
+        kwargs.setdefault(
+            "integrator", functools.partial(fixed_step_solve, n_substeps=n_substeps, n_bisections=n_bisections)
+        )
+        super().__init__(*args, **kwargs)
+        self._n_substeps = n_substeps
+        self._n_bisections = n_bisections
+        self._kernels = None
+        self._compiled = NUMBA_AVAILABLE
+
+    @property
+    def compiled(self):
+        """
+        Whether the filter runs on the compiled path (False once it has fallen back to NumPy).
+        """
+        return self._compiled
+
+    def _build_kernels(self):
+        """
+        Generates the nopython functions of every mode and transition into a module on disk
+        (see write_generated_module), so they are compiled once and then loaded from Numba's cache.
+        """
+        kernel_names = {}
+        kernel_sources = [inspect.getsource(sys.modules[__name__])]
+        import_source = []
+        source = ""
+
+        def kernel(func):
+            """ Name of a model kernel in the generated module, importing it on first use. """
+            if func not in kernel_names:
+                module_name, name = _kernel_reference(func)
+                kernel_names[func] = "kernel_%d" % len(kernel_names)
+                kernel_sources.append(inspect.getsource(getattr(func, "py_func", func)))
+                import_source.append(
+                    _KERNEL_TEMPLATE.format(module=module_name, name=name, idx=len(kernel_names) - 1)
+                )
+            return kernel_names[func]
+
+        def call(func, time_varying):
+            """ Call of a reset or guard Jacobian, passing the time only to time-varying ones. """
+            if time_varying:
+                return kernel(func) + "(t, states, inputs, dt, parameters)"
+            return kernel(func) + "(states, inputs, dt, parameters)"
+
+        kernels = {
+            "parameters": np.asarray(self._parameters, dtype=np.float64),
+            "W": {},
+            "V": {},
+            "guard_modes": {},
+            "guard_values": {},
+            "predict_segment": {},
+            "measurement_update": {},
+            "transition": {},
+        }
+        mode_names = {}
+        for mode_idx, (mode, funcs) in enumerate(self._dynamics_dict.items()):
+            mode_names[mode] = mode_idx
+            kernels["W"][mode] = np.ascontiguousarray(self._noise_matrices_dict[mode]["W"], dtype=np.float64)
+            kernels["V"][mode] = np.ascontiguousarray(self._noise_matrices_dict[mode]["V"], dtype=np.float64)
+            mode_guards = self._guards_dict.get(mode, {})
+            kernels["guard_modes"][mode] = list(mode_guards.keys())
+            guard_lines = [
+                "    values[%d] = _as_scalar(%s(t, states, inputs, dt, parameters))" % (guard_idx, kernel(guard["g"]))
+                for guard_idx, guard in enumerate(mode_guards.values())
+            ]
+            source += _MODE_TEMPLATE.format(
+                mode=mode_idx,
+                n_guards=len(mode_guards),
+                guard_lines="\n".join(guard_lines),
+                f_cont=kernel(funcs["f_cont"]),
+                A_disc=kernel(funcs["A_disc"]),
+                y=kernel(funcs["y"]),
+                C=kernel(funcs["C"]),
+            )
+
+        """ Transitions are keyed (pre-event mode, post-event mode, mode of the triggering guard); the post-event
+        mode differs from the guard's mode when a Zeno check redirects into a sticking mode. """
+        transition_names = {}
+        for pre_mode in self._guards_dict:
+            for event_mode, guard in self._guards_dict[pre_mode].items():
+                post_modes = [event_mode]
+                if pre_mode in self._zeno_modes:
+                    post_modes.append(self._zeno_modes[pre_mode])
+                for post_mode in post_modes:
+                    reset = self._resets_dict[pre_mode][post_mode]
+                    reset_time_varying = reset.get("time_varying", False)
+                    transition_idx = len(transition_names)
+                    transition_names[(pre_mode, post_mode, event_mode)] = transition_idx
+                    source += _TRANSITION_TEMPLATE.format(
+                        transition=transition_idx,
+                        r=call(reset["r"], reset_time_varying),
+                        R=call(reset["R"], reset_time_varying),
+                        Rt=call(reset["Rt"], True) if "Rt" in reset else "np.zeros(states.shape[0])",
+                        G=call(guard["G"], guard.get("time_varying", False)),
+                        Gt=kernel(guard["Gt"]),
+                        f_pre=kernel(self._dynamics_dict[pre_mode]["f_cont"]),
+                        f_post=kernel(self._dynamics_dict[post_mode]["f_cont"]),
+                    )
+
+        """ The digest of the backend and kernel sources makes the module, and so Numba's cache, change with them. """
+        digest = hashlib.sha1("".join(kernel_sources).encode()).hexdigest()
+        source = _STEP_MODULE_HEADER.format(digest=digest, backend=__name__) + "".join(import_source) + source
+        module = write_generated_module(source, "compiled_skf")
+        for mode, mode_idx in mode_names.items():
+            for name in ["guard_values", "predict_segment", "measurement_update"]:
+                kernels[name][mode] = getattr(module, "%s_%d" % (name, mode_idx))
+        for transition, transition_idx in transition_names.items():
+            kernels["transition"][transition] = getattr(module, "transition_%d" % transition_idx)
+        return kernels
+
+    def _compile(self, current_time, inputs):
+        """
+        Builds the kernels and compiles all of them with a dry run on the current estimate, so that a kernel
+        Numba cannot compile is found before any filter state changes. Falls back to NumPy as a whole on failure.
+        """
+        try:
+            kernels = self._build_kernels()
+            t = float(current_time)
+            parameters = kernels["parameters"]
+            for mode in self._dynamics_dict:
+                kernels["guard_values"][mode](t, self._current_state, inputs, self._dt, parameters)
+                kernels["predict_segment"][mode](
+                    t, t + self._dt, self._current_state, self._current_cov, kernels["W"][mode],
+                    inputs, self._dt, parameters, self._n_substeps, self._n_bisections,
+                )
+                measurement = _as_vector(self._dynamics_dict[mode]["y"](self._current_state, self._parameters))
+                kernels["measurement_update"][mode](
+                    self._current_state, self._current_cov, measurement, kernels["V"][mode], parameters
+                )
+            for transition in kernels["transition"].values():
+                transition(t, self._current_state, self._current_cov, inputs, self._dt, parameters)
+        except Exception as error:
+            warnings.warn("CompiledSKF falls back to the NumPy path: " + repr(error))
+            self._compiled = False
+            return
+        self._kernels = kernels
+
+    def _predict(self, current_time, inputs):
+        """
+        Prior update on the compiled path; see SKF.predict.
+        """
+        inputs = np.asarray(inputs, dtype=np.float64)
+        if self._compiled and self._kernels is None:
+            self._compile(current_time, inputs)
+        if not self._compiled:
+            return super()._predict(current_time, inputs)
+
+        kernels = self._kernels
+        t = float(current_time)
+        end_time = t + self._dt
+        n_step_events = 0
+        while True:
+            t, self._current_state[:], self._current_cov[:], guard_idx = kernels["predict_segment"][self._current_mode](
+                t,
+                end_time,
+                self._current_state,
+                self._current_cov,
+                kernels["W"][self._current_mode],
+                inputs,
+                self._dt,
+                kernels["parameters"],
+                self._n_substeps,
+                self._n_bisections,
+            )
+            if guard_idx < 0:
+                break
+            """ If events are accumulating (Zeno/chattering), switch to the declared sticking mode instead. """
+            event_mode = kernels["guard_modes"][self._current_mode][guard_idx]
+            n_step_events += 1
+            new_mode = self._check_zeno(t, event_mode, n_step_events)
+            self._current_state[:], self._current_cov[:] = kernels["transition"][(self._current_mode, new_mode, event_mode)](
+                t, self._current_state, self._current_cov, inputs, self._dt, kernels["parameters"]
+            )
+            self._current_mode = new_mode
+
+    def _measurement_update(self, measurement):
+        if not self._compiled or self._kernels is None:
+            return super()._measurement_update(measurement)
+        self._current_state[:], self._current_cov[:] = self._kernels["measurement_update"][self._current_mode](
+            self._current_state,
+            self._current_cov,
+            np.asarray(measurement, dtype=np.float64),
+            self._kernels["V"][self._current_mode],
+            self._kernels["parameters"],
+        )
+
+    def _hybrid_posterior_update(self, current_time, current_input):
+        if not self._compiled or self._kernels is None:
+            return super()._hybrid_posterior_update(current_time, current_input)
+        kernels = self._kernels
+        current_input = np.asarray(current_input, dtype=np.float64)
+        event_time = float(current_time) + self._dt
+        guard_values = kernels["guard_values"][self._current_mode](
+            event_time, self._current_state, current_input, self._dt, kernels["parameters"]
+        )
+        for guard_idx in range(len(guard_values)):
+            if guard_values[guard_idx] < 0:
+                event_mode = kernels["guard_modes"][self._current_mode][guard_idx]
+                new_mode = self._check_zeno(event_time, event_mode, 1)
+                self._current_state[:], self._current_cov[:] = kernels["transition"][(self._current_mode, new_mode, event_mode)](
+                    event_time, self._current_state, self._current_cov, current_input, self._dt, kernels["parameters"]
+                )
+                self._current_mode = new_mode
+                break
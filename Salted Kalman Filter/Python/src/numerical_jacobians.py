@@ -0,0 +1,203 @@
+"""
+numerical_jacobians.py
+
+This module fills in the Jacobians the SKF needs (`A_disc`, `C`, `R`, `G`, `Gt`) for models whose flows,
+measurements, resets and guards are black-box NumPy functions instead of lambdified SymPy expressions.
+
+Key Components:
+- `color_jacobian_columns`: Greedy column coloring of a Jacobian sparsity pattern. Columns with no shared
+  nonzero row get the same color and are perturbed together, so a sparse n-state Jacobian costs one
+  function evaluation per color instead of one per state.
+- `numerical_jacobian`: Forward finite-difference or complex-step Jacobian of a function at a point,
+  optionally compressed with a sparsity pattern and evaluated in a single vectorized call.
+- `fill_missing_jacobians`: Adds numerical Jacobians to the `dynamics`/`resets`/`guards` dicts for any
+  entry that is not already provided, memoizing results for repeated inputs.
+
+Sparsity patterns can be given next to the functions in the model dicts as `A_sparsity` (flow), `C_sparsity`
+(measurement), `R_sparsity` (reset) and `G_sparsity` (guard), each a boolean (outputs x states) array.
+"""
+
+from collections import OrderedDict
+import numpy as np
+
+
+def color_jacobian_columns(sparsity):
+    """
+    Greedily colors the columns of a Jacobian sparsity pattern so that no two columns of the same
+    color share a nonzero row.
+    sparsity (np.array): Boolean (outputs x states) array of structurally nonzero entries.
+    Returns (np.array): Color of each column.
+    """
+    sparsity = np.asarray(sparsity, dtype=bool)
+    n_cols = np.shape(sparsity)[1]
+    colors = -np.ones(n_cols, dtype=int)
+    color_rows = []
+    for col in range(n_cols):
+        rows = sparsity[:, col]
+        for color, used_rows in enumerate(color_rows):
+            if not np.any(used_rows & rows):
+                colors[col] = color
+                used_rows |= rows
+                break
+        else:
+            colors[col] = len(color_rows)
+            color_rows.append(rows.copy())
+    return colors
+
+
+def numerical_jacobian(func, x, method="finite_difference", sparsity=None, vectorized=False, step=None):
+    """
+    Computes the Jacobian of func at x numerically.
+    func (callable): Maps a state vector (n,) to an output array. If vectorized, maps an (n, k) array of
+        states (one per column) to an (m, k) array of outputs.
+    x (np.array): Point to differentiate at.
+    method (str): "finite_difference" (forward differences) or "complex_step" (func must accept complex input).
+    sparsity (np.array): Optional boolean (m x n) sparsity pattern used to compress the evaluations.
+    vectorized (bool): Evaluate all perturbed points in one call of func.
+    step (float): Perturbation size. Defaults to sqrt(machine eps) for finite differences and 1e-20 for complex step.
+    """
+    x = np.asarray(x, dtype=float).flatten()
+    n = np.shape(x)[0]
+    if sparsity is None:
+        colors = np.arange(n)
+    else:
+        colors = color_jacobian_columns(sparsity)
+    n_colors = np.max(colors) + 1 if n > 0 else 0
+
+    if method == "complex_step":
+        h = np.full(n, 1e-20 if step is None else step)
+        seeds = np.zeros((n, n_colors), dtype=complex)
+        seeds[np.arange(n), colors] = 1j * h
+    elif method == "finite_difference":
+        if step is None:
+            h = np.sqrt(np.finfo(float).eps) * np.maximum(1.0, np.abs(x))
+        else:
+            h = np.full(n, step)
+        seeds = np.zeros((n, n_colors))
+        seeds[np.arange(n), colors] = h
+    else:
+        raise ValueError("Unknown differentiation method: " + str(method))
+
+    """ Evaluate the perturbed points, one per color. """
+    points = x[:, None] + seeds
+    if method == "finite_difference":
+        points = np.hstack([x[:, None], points])
+    if vectorized:
+        values = np.asarray(func(points)).reshape(-1, np.shape(points)[1])
+    else:
+        values = np.stack([np.asarray(func(points[:, idx])).flatten() for idx in range(np.shape(points)[1])], axis=1)
+
+    if method == "complex_step":
+        compressed = values.imag
+    else:
+        compressed = values[:, 1:] - values[:, [0]]
+
+    """ Decompress: column j of the Jacobian is read off its color, masked by the sparsity pattern. """
+    jacobian = compressed[:, colors] / h
+    if sparsity is not None:
+        jacobian = jacobian * np.asarray(sparsity, dtype=bool)
+    return jacobian
+
+
+def _array_key(arg):
+    """
+    Hashable key for a function argument.
+    """
+    arg = np.asarray(arg)
+    return (arg.shape, arg.dtype.str, arg.tobytes())
+
+
+def _memoize(func, cache_size):
+    """
+    Wraps func with a least-recently-used cache keyed on the values of its array arguments.
+    """
+    if cache_size == 0:
+        return func
+    cache = OrderedDict()
+
+    def memoized(*args):
+        key = tuple(_array_key(arg) for arg in args)
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        value = func(*args)
+        cache[key] = value
+        if len(cache) > cache_size:
+            cache.popitem(last=False)
+        return value
+
+    return memoized
+
+
+def fill_missing_jacobians(
+    dynamics,
+    resets,
+    guards,
+    method="finite_difference",
+    vectorized=False,
+    cache_size=128,
+):
+    """
+    Adds numerical Jacobians for every missing "A_disc", "C", "R", "G" and "Gt" entry, in place.
+    Resets and guards flagged "time_varying" get time-dependent "R"/"G" and, for resets, "Rt".
+    dynamics (dict): Dynamics for each mode ("f_cont" and "y" are required).
+    resets (dict): Resets for each allowable transition ("r" is required).
+    guards (dict): Guards for each allowable transition ("g" is required).
+    method (str): "finite_difference" or "complex_step", see numerical_jacobian.
+    vectorized (bool): The model functions accept (n, k) arrays of states, see numerical_jacobian.
+    cache_size (int): Number of recent evaluations remembered per Jacobian (0 disables caching).
+    Note: "A_disc" is the Euler discretization I + dt * df/dx, matching the symbolic models, and
+    "G" of a time-invariant guard is evaluated at t = 0 since its signature carries no time.
+    Returns (Tuple[Dict, Dict, Dict]): The same dynamics, resets and guards dicts.
+    """
+    def jacobian(func, x, sparsity):
+        return numerical_jacobian(func, x, method=method, sparsity=sparsity, vectorized=vectorized)
+
+    for mode, funcs in dynamics.items():
+        if "A_disc" not in funcs:
+            def A_disc(states, inputs, dt, parameters, f=funcs["f_cont"], sparsity=funcs.get("A_sparsity")):
+                df_dx = jacobian(lambda x: f(x, inputs, dt, parameters), states, sparsity)
+                return np.eye(np.shape(df_dx)[1]) + dt * df_dx
+            funcs["A_disc"] = _memoize(A_disc, cache_size)
+        if "C" not in funcs:
+            def C(states, parameters, y=funcs["y"], sparsity=funcs.get("C_sparsity")):
+                return jacobian(lambda x: y(x, parameters), states, sparsity)
+            funcs["C"] = _memoize(C, cache_size)
+
+    def time_derivative(func, t, states, inputs, dt, parameters):
+        return numerical_jacobian(
+            lambda time: func(time[0], states, inputs, dt, parameters), np.array([t]), method=method
+        )
+
+    for pre_mode in resets:
+        for post_mode, funcs in resets[pre_mode].items():
+            if funcs.get("time_varying", False):
+                if "R" not in funcs:
+                    def R(t, states, inputs, dt, parameters, r=funcs["r"], sparsity=funcs.get("R_sparsity")):
+                        return jacobian(lambda x: r(t, x, inputs, dt, parameters), states, sparsity)
+                    funcs["R"] = _memoize(R, cache_size)
+                if "Rt" not in funcs:
+                    def Rt(t, states, inputs, dt, parameters, r=funcs["r"]):
+                        return time_derivative(r, t, states, inputs, dt, parameters)
+                    funcs["Rt"] = _memoize(Rt, cache_size)
+            elif "R" not in funcs:
+                def R(states, inputs, dt, parameters, r=funcs["r"], sparsity=funcs.get("R_sparsity")):
+                    return jacobian(lambda x: r(x, inputs, dt, parameters), states, sparsity)
+                funcs["R"] = _memoize(R, cache_size)
+
+    for pre_mode in guards:
+        for post_mode, funcs in guards[pre_mode].items():
+            if "G" not in funcs:
+                if funcs.get("time_varying", False):
+                    def G(t, states, inputs, dt, parameters, g=funcs["g"], sparsity=funcs.get("G_sparsity")):
+                        return jacobian(lambda x: g(t, x, inputs, dt, parameters), states, sparsity)
+                else:
+                    def G(states, inputs, dt, parameters, g=funcs["g"], sparsity=funcs.get("G_sparsity")):
+                        return jacobian(lambda x: g(0.0, x, inputs, dt, parameters), states, sparsity)
+                funcs["G"] = _memoize(G, cache_size)
+            if "Gt" not in funcs:
+                def Gt(t, states, inputs, dt, parameters, g=funcs["g"]):
+                    return time_derivative(g, t, states, inputs, dt, parameters)
+                funcs["Gt"] = _memoize(Gt, cache_size)
+
+    return dynamics, resets, guards
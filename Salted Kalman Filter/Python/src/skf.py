@@ -14,20 +14,34 @@ Key Features:
 Main Class:
 - SKF:
     - predict: Performs a prior update (state and covariance prediction) over one timestep, handling hybrid transitions.
+      Event detection is skipped while the estimated time to the nearest guard exceeds guard_safety_factor timesteps.
+    - predict_steps: Performs prior updates over several timesteps without measurements, integrating timesteps far from any guard in one call.
     - update: Performs a posterior update using a new noisy measurement and adjusts state/covariance if mode transitions occur.
+    - step: Fused predict and update that reuses preallocated scratch matrices and can write into caller-provided arrays.
+      step works in place on the filter's persistent state/covariance buffers; predict and update return new arrays.
+    - get_state / get_cov / get_mode: Return copies of the current estimate and the current mode.
+    - set_estimate: Replaces the current estimate and mode.
+
+See information_skf.py for an information-form measurement update suited to large measurement vectors.
 """
 
 import sys
 import pathlib
 import numpy as np
 from scipy.integrate import solve_ivp
+from scipy.linalg import cho_factor, cho_solve
 
 sys.path.append(str(pathlib.Path(__file__).parent.parent))
 from src.hybrid_helper_functions import (
     solve_ivp_dynamics_func,
     solve_ivp_guard_funcs,
     solve_ivp_extract_hybrid_events,
+    zeno_checked_mode,
+    evaluate_hybrid_map,
+    estimate_time_to_guard,
+    integrate_free_flight,
     compute_saltation_matrix,
+    apply_saltation,
 )
 
 class SKF:
@@ -42,6 +56,12 @@ class SKF:
         resets,
         guards,
         parameters,
+        zeno_modes=None,
+        max_events_per_step=None,
+        min_event_interval=None,
+        factored_saltation=False,
+        integrator=solve_ivp,
+        guard_safety_factor=2.0,
     ):
         """
         init_state (np.array): Initial state.
@@ -51,9 +71,17 @@ class SKF:
         resets (dict): Resets for each allowable transition.
         guards (dict): Guards for each allowable transition.
         parameters (np.array): Extra parameters of the system.
+        zeno_modes (dict): Sticking mode to switch to from each mode once events accumulate (Zeno/chattering).
+        max_events_per_step (int): Number of events within one timestep that counts as accumulating.
+        min_event_interval (float): Time between consecutive events of the same transition below which they count as accumulating.
+        factored_saltation (bool): Apply saltation as reset Jacobian plus rank-one term instead of a dense matrix.
+        integrator (callable): solve_ivp-compatible integrator, e.g. numba_backend.fixed_step_solve.
+        guard_safety_factor (float): predict skips event detection while the estimated time to the nearest guard
+            exceeds guard_safety_factor timesteps. None always detects events.
         """
-        self._current_state = init_state
-        self._current_cov = init_cov
+        """ The estimate is kept in persistent buffers that predict, update and step write into. """
+        self._current_state = np.array(init_state, dtype=float)
+        self._current_cov = np.array(init_cov, dtype=float)
         self._current_mode = init_mode
         self._dt = dt
         self._noise_matrices_dict = noise_matrices
@@ -61,12 +89,70 @@ class SKF:
         self._resets_dict = resets
         self._guards_dict = guards
         self._parameters = parameters
+        self._zeno_modes = zeno_modes if zeno_modes is not None else {}
+        self._max_events_per_step = max_events_per_step
+        self._min_event_interval = min_event_interval
+        self._last_event_times = {}
+        self._factored_saltation = factored_saltation
+        self._integrator = integrator
+        self._guard_safety_factor = guard_safety_factor
 
         self._n_states = np.shape(self._current_state)[0]
+        self._workspaces = {}
+        self._cov_workspace = np.zeros((self._n_states, self._n_states))
+
+    def _check_zeno(self, event_time, new_mode, n_step_events):
+        """
+        Returns the mode to transition into for an event at event_time (see zeno_checked_mode).
+        """
+        return zeno_checked_mode(
+            self._last_event_times,
+            self._current_mode,
+            new_mode,
+            event_time,
+            n_step_events,
+            self._zeno_modes,
+            self._max_events_per_step,
+            self._min_event_interval,
+        )
 
     def predict(self, current_time, inputs):
         """
         Prior update.
+        Returns new state and covariance arrays; use step for the allocation-free path.
+        """
+        self._predict(current_time, inputs)
+        return self._current_state.copy(), self._current_cov.copy()
+
+    def _propagate_cov(self, dynamics_cov, W):
+        """
+        Covariance prediction A P A^T + W, written into the covariance buffer.
+        """
+        np.matmul(dynamics_cov, self._current_cov, out=self._cov_workspace)
+        np.matmul(self._cov_workspace, dynamics_cov.T, out=self._current_cov)
+        self._current_cov += W
+
+    def _far_from_guards(self, current_time, inputs):
+        """
+        Whether the estimated time to the nearest guard of the current mode exceeds guard_safety_factor timesteps.
+        """
+        if self._guard_safety_factor is None:
+            return False
+        time_to_guard = estimate_time_to_guard(
+            self._dynamics_dict,
+            self._guards_dict,
+            self._current_mode,
+            current_time,
+            self._current_state,
+            inputs,
+            self._dt,
+            self._parameters,
+        )
+        return time_to_guard > self._guard_safety_factor * self._dt
+
+    def _predict(self, current_time, inputs):
+        """
+        Prior update of the state and covariance buffers, shared by predict, predict_steps and step.
         """
         end_time = current_time + self._dt
 
@@ -78,38 +164,57 @@ class SKF:
             self._guards_dict, self._current_mode, inputs, self._dt, self._parameters
         )
 
-        current_start_state = self._current_state.copy()
-        sol = solve_ivp(
-            current_dynamics,
-            [current_time, end_time],
-            self._current_state,
-            events=current_guards,
-        )
-        current_state = np.zeros(self._n_states)
+        """ The state buffer is only overwritten at the end, so it still holds the start state of the flow. """
+        current_start_state = self._current_state
+        sol = None
+        if self._far_from_guards(current_time, inputs):
+            """ Far from every guard, integrate without event detection. """
+            sol = self._integrator(current_dynamics, [current_time, end_time], self._current_state)
+            if any(np.ravel(guard(end_time, sol.y[:, -1]))[0] <= 0 for guard in current_guards):
+                """ The first-order estimate missed a crossing, so redo the timestep with event detection. """
+                sol = None
 
-        """ If we hit guard, apply reset. """
-        (
-            hybrid_event_state,
-            hybrid_event_time,
-            new_mode,
-        ) = solve_ivp_extract_hybrid_events(sol, possible_modes)
+        if sol is None:
+            sol = self._integrator(
+                current_dynamics,
+                [current_time, end_time],
+                self._current_state,
+                events=current_guards,
+            )
+            """ If we hit guard, apply reset. """
+            (
+                hybrid_event_state,
+                hybrid_event_time,
+                new_mode,
+            ) = solve_ivp_extract_hybrid_events(sol, possible_modes)
+        else:
+            hybrid_event_state, hybrid_event_time, new_mode = None, None, None
 
+        n_step_events = 0
         while new_mode is not None:
+            """ If events are accumulating (Zeno/chattering), switch to the declared sticking mode instead. """
+            event_mode = new_mode
+            n_step_events += 1
+            new_mode = self._check_zeno(hybrid_event_time[0], new_mode, n_step_events)
+
             """Apply reset."""
-            current_state = self._resets_dict[self._current_mode][new_mode]['r'](
-                hybrid_event_state, inputs, self._dt, self._parameters
+            current_state = evaluate_hybrid_map(
+                self._resets_dict[self._current_mode][new_mode],
+                'r',
+                hybrid_event_time[0],
+                hybrid_event_state,
+                inputs,
+                self._dt,
+                self._parameters,
             ).reshape(np.shape(hybrid_event_state))
 
             """ Apply covariance updates: dynamics and saltation matrix."""
             dynamics_cov = self._dynamics_dict[self._current_mode]["A_disc"](
                 current_start_state, inputs, sol.t[-1] - sol.t[0], self._parameters
             )
-            self._current_cov = (
-                dynamics_cov @ self._current_cov @ dynamics_cov.T
-                + self._noise_matrices_dict[self._current_mode]["W"]
-            )
+            self._propagate_cov(dynamics_cov, self._noise_matrices_dict[self._current_mode]["W"])
             salt = compute_saltation_matrix(
-                t=hybrid_event_time,
+                t=hybrid_event_time[0],
                 pre_event_state=hybrid_event_state,
                 inputs=inputs,
                 dt=self._dt,
@@ -120,8 +225,10 @@ class SKF:
                 resets_dict=self._resets_dict,
                 guards_dict=self._guards_dict,
                 post_event_state=current_state,
+                event_mode=event_mode,
+                factored=self._factored_saltation,
             )
-            self._current_cov = salt @ self._current_cov @ salt.T
+            self._current_cov[:] = apply_saltation(salt, self._current_cov)
 
             """ Update guard and simulate. """
             self._current_mode = new_mode
@@ -139,8 +246,8 @@ class SKF:
                 self._dt,
                 self._parameters,
             )
-            current_start_state = current_state.copy()
-            sol = solve_ivp(
+            current_start_state = current_state
+            sol = self._integrator(
                 current_dynamics,
                 [hybrid_event_time, end_time],
                 current_state,
@@ -152,65 +259,212 @@ class SKF:
                 new_mode,
             ) = solve_ivp_extract_hybrid_events(sol, possible_modes)
 
-        """ Once no more hybrid events, grab the terminal states. """
-        for idx in range(len(sol.y)):
-            """Grab the state at the last timestep."""
-            current_state[idx] = sol.y[idx][-1]
-
         """ Propagate the rest of the covariance. """
         dynamics_cov = self._dynamics_dict[self._current_mode]["A_disc"](
             current_start_state, inputs, sol.t[-1] - sol.t[0], self._parameters
         )
-        
-        self._current_cov = (
-            dynamics_cov @ self._current_cov @ dynamics_cov.T
-            + self._noise_matrices_dict[self._current_mode]["W"]
-        )
+        self._propagate_cov(dynamics_cov, self._noise_matrices_dict[self._current_mode]["W"])
+
+        """ Once no more hybrid events, grab the terminal states. """
+        self._current_state[:] = sol.y[:, -1]
+
+    def predict_steps(self, current_time, inputs, n_steps, safety_factor=2.0):
+        """
+        Prior update over n_steps timesteps without measurements, returning the states and covariances on the dt grid.
+        While the estimated time to the nearest guard exceeds safety_factor timesteps, those timesteps are
+        integrated in one call without event detection. Timesteps near a predicted crossing use predict.
+        Measurements cannot be fused in between, so this only helps over prediction-only stretches
+        (e.g. measurement dropouts or forecasting); use step when a measurement arrives every timestep.
+        """
+        states = np.zeros((n_steps, self._n_states))
+        covs = np.zeros((n_steps, self._n_states, self._n_states))
+        step_idx = 0
+        while step_idx < n_steps:
+            step_time = current_time + step_idx * self._dt
+            n_remaining = n_steps - step_idx
 
-        self._current_state = current_state
-        return self._current_state, self._current_cov
+            """ Number of timesteps that are safely away from the guards. """
+            time_to_guard = estimate_time_to_guard(
+                self._dynamics_dict,
+                self._guards_dict,
+                self._current_mode,
+                step_time,
+                self._current_state,
+                inputs,
+                self._dt,
+                self._parameters,
+            )
+            if time_to_guard >= n_remaining * safety_factor * self._dt:
+                n_free = n_remaining
+            else:
+                n_free = int(time_to_guard / (safety_factor * self._dt))
+
+            grid_states = np.zeros((0, self._n_states))
+            if n_free > 1:
+                current_dynamics = solve_ivp_dynamics_func(
+                    self._dynamics_dict, self._current_mode, inputs, self._dt, self._parameters
+                )
+                current_guards, _ = solve_ivp_guard_funcs(
+                    self._guards_dict, self._current_mode, inputs, self._dt, self._parameters
+                )
+                grid_states = integrate_free_flight(
+                    self._integrator,
+                    current_dynamics,
+                    current_guards,
+                    step_time,
+                    self._current_state,
+                    self._dt,
+                    n_free,
+                )
+
+            """ Propagate the covariance along the free flight, one timestep at a time. """
+            for grid_state in grid_states:
+                dynamics_cov = self._dynamics_dict[self._current_mode]["A_disc"](
+                    self._current_state, inputs, self._dt, self._parameters
+                )
+                self._propagate_cov(dynamics_cov, self._noise_matrices_dict[self._current_mode]["W"])
+                self._current_state[:] = grid_state
+                states[step_idx] = self._current_state
+                covs[step_idx] = self._current_cov
+                step_idx += 1
+
+            if len(grid_states) == 0:
+                self._predict(step_time, inputs)
+                states[step_idx] = self._current_state
+                covs[step_idx] = self._current_cov
+                step_idx += 1
+
+        return states, covs
 
     def update(self, current_time, current_input, measurement):
         """
         Posterior update.
         When a new measurement comes in, update the covariance.
         If updated state is pulled into new mode, then apply saltation matrix and reset.
+        Returns new state and covariance arrays; use step for the allocation-free path.
+        """
+        self._measurement_update(measurement)
+
+        self._hybrid_posterior_update(current_time, current_input)
+        return self._current_state.copy(), self._current_cov.copy()
+
+    def step(self, current_time, inputs, measurement, out_state=None, out_cov=None):
+        """
+        Fused prior and posterior update: predict followed by update with a new measurement.
+        The covariance prediction and the measurement update work in place on the filter's state and
+        covariance buffers, using preallocated scratch matrices that are reused across calls, so steps
+        without hybrid events allocate no new state or covariance arrays.
+        The results are also written into out_state/out_cov (e.g. rows of a history array) when given.
+        Returns out_state/out_cov, or the filter's own state/covariance buffers for the ones not given;
+        the buffers are overwritten by the next call.
+        """
+        self._predict(current_time, inputs)
+        self._measurement_update(measurement)
+        self._hybrid_posterior_update(current_time, inputs)
+
+        if out_state is None:
+            out_state = self._current_state
+        else:
+            out_state[:] = self._current_state
+        if out_cov is None:
+            out_cov = self._current_cov
+        else:
+            out_cov[:] = self._current_cov
+        return out_state, out_cov
+
+    def get_state(self):
+        """Return a copy of the current state estimate."""
+        return self._current_state.copy()
+
+    def get_cov(self):
+        """Return a copy of the current covariance."""
+        return self._current_cov.copy()
+
+    def get_mode(self):
+        """Return the current mode."""
+        return self._current_mode
+
+    def set_estimate(self, state, cov, mode):
+        """Replace the current state estimate, covariance and mode (e.g. to roll back a failed step)."""
+        self._current_state[:] = state
+        self._current_cov[:] = cov
+        self._current_mode = mode
+
+    def _measurement_update(self, measurement):
+        """
+        Kalman measurement update of the current state and covariance, in place.
+        Subclasses override this to change the update (e.g. InformationSKF), for both update and step.
         """
         C = self._dynamics_dict[self._current_mode]['C'](
                 self._current_state,
                 self._parameters,
             )
         V = self._noise_matrices_dict[self._current_mode]['V']
-        K = self._current_cov@C.T@np.linalg.inv(C@self._current_cov@C.T + V)
-
-        """ Measurement update. """
         measurement_est = self._dynamics_dict[self._current_mode]['y'](
                 self._current_state,
                 self._parameters,
             ).flatten()
-        C = self._dynamics_dict[self._current_mode]['C'](
-                self._current_state,
-                self._parameters,
-            )
-        residual = measurement - measurement_est
-        self._current_state = self._current_state + K@residual
-        self._current_cov = self._current_cov - K@C@self._current_cov
+        workspace = self._get_workspace(np.shape(C)[0])
+        np.matmul(self._current_cov, C.T, out=workspace["PCt"])
+        np.matmul(C, workspace["PCt"], out=workspace["S"])
+        workspace["S"] += V
+        np.subtract(measurement, measurement_est, out=workspace["residual"])
+
+        """ K = P C^T S^-1, solved as S K^T = C P through the Cholesky factor of S. """
+        np.matmul(C, self._current_cov, out=workspace["CP"])
+        workspace["KT"][:] = workspace["CP"]
+        S_factor = cho_factor(workspace["S"], overwrite_a=True, check_finite=False)
+        KT = cho_solve(S_factor, workspace["KT"], overwrite_b=True, check_finite=False)
+
+        np.matmul(KT.T, workspace["residual"], out=workspace["dx"])
+        self._current_state += workspace["dx"]
+        np.matmul(KT.T, workspace["CP"], out=workspace["KCP"])
+        self._current_cov -= workspace["KCP"]
+
+    def _get_workspace(self, n_measurements):
+        """
+        Returns the scratch matrices for measurements of size n_measurements, allocating them on first use.
+        """
+        if n_measurements not in self._workspaces:
+            self._workspaces[n_measurements] = {
+                "PCt": np.zeros((self._n_states, n_measurements)),
+                "S": np.zeros((n_measurements, n_measurements), order="F"),
+                "CP": np.zeros((n_measurements, self._n_states)),
+                "KT": np.zeros((n_measurements, self._n_states), order="F"),
+                "KCP": np.zeros((self._n_states, self._n_states)),
+                "residual": np.zeros(n_measurements),
+                "dx": np.zeros(self._n_states),
+            }
+        return self._workspaces[n_measurements]
 
-        """ Check guard conditions. If any guard has been reached, then apply hybrid posterior update. """
+    def _hybrid_posterior_update(self, current_time, current_input):
+        """
+        Check guard conditions. If any guard has been reached, then apply hybrid posterior update.
+        The state refers to the end of the predicted timestep, so guards, resets and saltation matrices of
+        posterior events are evaluated at current_time + dt.
+        """
+        event_time = current_time + self._dt
         current_guards, possible_modes = solve_ivp_guard_funcs(
             self._guards_dict, self._current_mode, current_input, self._dt, self._parameters
         )
         for guard_idx in range(len(current_guards)):
-            if current_guards[guard_idx](current_time, self._current_state) < 0:
-                new_mode = possible_modes[guard_idx]
+            if current_guards[guard_idx](event_time, self._current_state) < 0:
+                event_mode = possible_modes[guard_idx]
+                new_mode = self._check_zeno(event_time, event_mode, 1)
                 """Apply reset."""
-                new_state = self._resets_dict[self._current_mode][new_mode]['r'](
-                    self._current_state, current_input, self._dt, self._parameters
+                new_state = evaluate_hybrid_map(
+                    self._resets_dict[self._current_mode][new_mode],
+                    'r',
+                    event_time,
+                    self._current_state,
+                    current_input,
+                    self._dt,
+                    self._parameters,
                 ).reshape(np.shape(self._current_state))
 
                 """ Apply covairance updates: dynamics and saltation matrix."""
                 salt = compute_saltation_matrix(
-                    t=current_time,
+                    t=event_time,
                     pre_event_state=self._current_state,
                     inputs=current_input,
                     dt=self._dt,
@@ -221,9 +475,10 @@ class SKF:
                     resets_dict=self._resets_dict,
                     guards_dict=self._guards_dict,
                     post_event_state=new_state,
+                    event_mode=event_mode,
+                    factored=self._factored_saltation,
                 )
-                self._current_state = new_state
-                self._current_cov = salt @ self._current_cov @ salt.T
+                self._current_state[:] = new_state
+                self._current_cov[:] = apply_saltation(salt, self._current_cov)
+                self._current_mode = new_mode
                 break
-
-        return self._current_state, self._current_cov